@@ -0,0 +1,116 @@
+"""
+Decision accounting.
+
+Every policy decision is folded into an in-memory counter keyed by day, action,
+policy, category, host and source segment, and periodically flushed to the
+decision_counters collection as one bulk upsert of $inc operations.
+"""
+
+import ipaddress
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from policy_engine import Decision
+
+
+COUNTER_KEY = ("day", "action", "policy_id", "category", "host", "segment")
+UNKNOWN_SEGMENT = "unknown"
+EPOCH = datetime(1970, 1, 1)
+
+
+def today() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+
+@lru_cache(maxsize=1024)
+def _epoch_day(days: int) -> str:
+    return (EPOCH + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def day_of(timestamp: float) -> str:
+    """UTC day key for an epoch timestamp"""
+    return _epoch_day(int(timestamp // 86400))
+
+
+@lru_cache(maxsize=65536)
+def source_segment(source_ip: Optional[str]) -> str:
+    """Collapse a client address to its /24 (IPv4) or /64 (IPv6) network"""
+    if not source_ip:
+        return UNKNOWN_SEGMENT
+    try:
+        address = ipaddress.ip_address(source_ip)
+    except ValueError:
+        return UNKNOWN_SEGMENT
+    prefix = 24 if address.version == 4 else 64
+    return str(ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+
+class DecisionAccountant:
+    """Aggregates decisions in memory until they are drained for a flush"""
+
+    def __init__(self, max_pending: int = 10000):
+        self.max_pending = max_pending
+        self._pending: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, decision: Decision, host: str, source_ip: Optional[str] = None,
+               count: int = 1, day: Optional[str] = None) -> bool:
+        """Count a decision, returning True once enough keys are pending to flush"""
+        key = (
+            day or today(),
+            decision.action,
+            decision.policy_id,
+            decision.category,
+            host,
+            source_segment(source_ip),
+        )
+        self._pending[key] += count
+        return len(self._pending) >= self.max_pending
+
+    def merge(self, counts: Counter) -> bool:
+        """Add counts already keyed like COUNTER_KEY, e.g. from an ingest worker"""
+        self._pending.update(counts)
+        return len(self._pending) >= self.max_pending
+
+    def drain(self) -> List[Tuple[Tuple[Any, ...], int]]:
+        """Take every pending counter, leaving the accountant empty"""
+        pending, self._pending = self._pending, Counter()
+        return list(pending.items())
+
+
+_indexed_databases = set()
+
+
+async def ensure_counter_indexes(db) -> None:
+    """Create the upsert key index on decision_counters once per database"""
+    if db.name in _indexed_databases:
+        return
+    from pymongo import ASCENDING
+    await db.decision_counters.create_index([(field, ASCENDING) for field in COUNTER_KEY], unique=True)
+    _indexed_databases.add(db.name)
+
+
+async def flush_decisions(db, accountant: DecisionAccountant) -> int:
+    """Write pending counters with a single unordered bulk upsert"""
+    pending = accountant.drain()
+    if not pending:
+        return 0
+    await ensure_counter_indexes(db)
+    from pymongo import UpdateOne
+    operations = [
+        UpdateOne(dict(zip(COUNTER_KEY, key)), {"$inc": {"count": count}}, upsert=True)
+        for key, count in pending
+    ]
+    await db.decision_counters.bulk_write(operations, ordered=False)
+    return len(operations)
+
+
+def counter_filter(days: Optional[int] = None) -> Dict[str, Any]:
+    """Query selecting decision counters from the last `days` days"""
+    if not days:
+        return {}
+    since = datetime.utcnow().toordinal() - days + 1
+    return {"day": {"$gte": datetime.fromordinal(since).strftime("%Y-%m-%d")}}
@@ -0,0 +1,126 @@
+"""
+Alert search.
+
+Builds the aggregation behind /api/alerts/search. Matching alerts come from the
+text index (title, description, destination) or the filter indexes, capped at
+a fixed number so the cost of a search does not grow with the collection.
+The requested page and the facet counts are then computed together over that
+capped set in one $facet stage; when the cap was reached the total and the
+facet counts only cover the capped matches, flagged by total_exact and
+facets_exact.
+
+The text index tokenizes on punctuation, so a host name in the query would
+match its labels separately ("facebook" or "com"). Host-like terms are taken
+out of the text search and matched against the destination field instead.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from policy_engine import normalize_host
+
+FACET_FIELDS = ("severity", "policy_triggered", "device_id")
+FILTER_FIELDS = ("severity", "policy_triggered", "device_id", "source_ip", "destination")
+TEXT_INDEX = "alert_text_search"
+
+_HOST_TERM = re.compile(r"[a-z0-9-]+(?:\.[a-z0-9-]+)+")
+
+
+async def ensure_search_indexes(db) -> None:
+    """Create the text and filter indexes on security_alerts, a no-op once they exist"""
+    alerts = db.security_alerts
+    await alerts.create_index(
+        [("title", "text"), ("description", "text"), ("destination", "text")],
+        name=TEXT_INDEX, weights={"title": 5, "destination": 3, "description": 1},
+    )
+    await alerts.create_index([("created_at", -1)])
+    # Filter plus recency, so a filtered page is read in index order
+    for field in FILTER_FIELDS:
+        await alerts.create_index([(field, 1), ("created_at", -1)])
+
+
+def split_search_text(text: Optional[str]) -> Tuple[Optional[str], List[str]]:
+    """Split a query into text search terms and host names like facebook.com"""
+    terms, hosts = [], []
+    for term in (text or "").split():
+        host = normalize_host(term) if "." in term and not term.startswith('"') else ""
+        if _HOST_TERM.fullmatch(host):
+            hosts.append(host)
+        else:
+            terms.append(term)
+    return " ".join(terms) or None, hosts
+
+
+def search_filter(filters: Dict[str, Any], resolved: Optional[bool] = None,
+                  created_after: Optional[datetime] = None,
+                  created_before: Optional[datetime] = None, hosts: Sequence[str] = ()) -> Dict[str, Any]:
+    query = {field: filters[field] for field in FILTER_FIELDS if filters.get(field) is not None}
+    if hosts:
+        destination = hosts[0] if len(hosts) == 1 else {"$in": list(hosts)}
+        if "destination" in query:
+            query["$and"] = [{"destination": destination}]
+        else:
+            query["destination"] = destination
+    if resolved is not None:
+        query["resolved"] = resolved
+    created = {}
+    if created_after:
+        created["$gte"] = created_after
+    if created_before:
+        created["$lt"] = created_before
+    if created:
+        query["created_at"] = created
+    return query
+
+
+def search_pipeline(query: Dict[str, Any], text: Optional[str], skip: int, limit: int,
+                    scan_limit: int, facet_size: int) -> List[Dict[str, Any]]:
+    """Aggregation returning one document with hits, total and facets"""
+    if text:
+        # $text must be the first stage; sorting before the cap keeps the best
+        # scan_limit matches, which the server does as a bounded top-k sort
+        pipeline = [
+            {"$match": {"$text": {"$search": text}, **query}},
+            {"$addFields": {"_score": {"$meta": "textScore"}}},
+            {"$sort": {"_score": -1, "created_at": -1}},
+            {"$limit": scan_limit},
+        ]
+        order = {"_score": -1, "created_at": -1}
+    else:
+        pipeline = [
+            {"$match": query},
+            {"$sort": {"created_at": -1}},
+            {"$limit": scan_limit},
+        ]
+        order = None
+
+    hits = [{"$sort": order}] if order else []
+    hits += [{"$skip": skip}, {"$limit": limit}, {"$project": {"_id": 0, "_score": 0}}]
+    facets = {
+        field: [
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": facet_size},
+        ]
+        for field in FACET_FIELDS
+    }
+    pipeline.append({"$facet": {"hits": hits, "total": [{"$count": "count"}], **facets}})
+    return pipeline
+
+
+def search_result(document: Dict[str, Any], scan_limit: int) -> Dict[str, Any]:
+    """Unpack the $facet output into hits, total and facet counts"""
+    total = document["total"][0]["count"] if document.get("total") else 0
+    # Below the cap every match was scanned, otherwise only the first scan_limit were
+    exact = total < scan_limit
+    return {
+        "total": total,
+        "total_exact": exact,
+        "facets_exact": exact,
+        "hits": document.get("hits", []),
+        "facets": {
+            field: [{"value": group["_id"], "count": group["count"]} for group in document.get(field, [])]
+            for field in FACET_FIELDS
+        },
+    }
@@ -0,0 +1,43 @@
+"""
+Lazily opened MongoDB database.
+
+Importing motor and pymongo is one of the larger costs of starting a worker,
+so the client is only created when a collection is first used. Until then the
+worker can already answer requests that do not touch the database.
+"""
+
+from typing import Any, Optional
+
+
+class LazyDatabase:
+    """Stands in for a motor database, opening the client on first attribute access"""
+
+    def __init__(self, url: str, name: str):
+        self.url = url
+        self.name = name
+        self._client: Optional[Any] = None
+        self._database: Optional[Any] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._database is not None
+
+    def connect(self):
+        if self._database is None:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self._client = AsyncIOMotorClient(self.url)
+            self._database = self._client[self.name]
+        return self._database
+
+    def __getattr__(self, attribute: str):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        return getattr(self.connect(), attribute)
+
+    def __getitem__(self, collection: str):
+        return self.connect()[collection]
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = self._database = None
@@ -0,0 +1,243 @@
+"""
+Streaming burst detection.
+
+Per-client request and block counts are kept in sliding-window count-min
+sketches, so memory stays fixed however many clients there are. A bounded set
+of heavy-hitter candidates is ranked by their sketch estimates to answer "top
+talkers", and a client crossing the request-rate or block-rate threshold
+raises a SecurityAlert-shaped document once per cooldown.
+"""
+
+import os
+import time
+import uuid
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class CountMinSketch:
+    """Fixed-size frequency estimates that never undercount"""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        if not 0 < width <= 0x10000:
+            raise ValueError("Sketch width must be between 1 and 65536")
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def indexes(self, key: str) -> List[int]:
+        """Cell of key in each row; sketches of the same shape share them"""
+        # Each row uses its own 16-bit slice of the hash, so rows collide independently
+        indexes = []
+        for row in range(self.depth):
+            if row % 4 == 0:
+                hashed = hash((key, row)) if row else hash(key)
+            indexes.append(((hashed >> (16 * (row % 4))) & 0xFFFF) % self.width)
+        return indexes
+
+    def add(self, indexes: List[int], count: int = 1) -> int:
+        """Count the key at indexes and return its new estimate"""
+        estimate = None
+        for row, index in zip(self.rows, indexes):
+            value = row[index] + count
+            row[index] = value
+            if estimate is None or value < estimate:
+                estimate = value
+        return estimate
+
+    def estimate(self, indexes: List[int]) -> int:
+        return min(row[index] for row, index in zip(self.rows, indexes))
+
+    def subtract(self, other: "CountMinSketch") -> None:
+        for row, expired in zip(self.rows, other.rows):
+            for index, value in enumerate(expired):
+                if value:
+                    row[index] -= value
+
+    def clear(self) -> None:
+        for row in self.rows:
+            row[:] = array("q", bytes(8 * self.width))
+
+
+class WindowedCountMin:
+    """Count-min sketch over the last `window` seconds, in `buckets` sub-windows"""
+
+    def __init__(self, window: float = 60.0, buckets: int = 6, width: int = 2048, depth: int = 4):
+        self.bucket_seconds = window / buckets
+        self.buckets = [CountMinSketch(width, depth) for _ in range(buckets)]
+        self.total = CountMinSketch(width, depth)
+        self.current = 0
+        self.current_start: Optional[float] = None
+
+    def advance(self, now: float) -> bool:
+        """Expire sub-windows older than the window, returning True if any expired.
+
+        Time a little behind the current sub-window counts into it. Time more
+        than a whole window behind, e.g. a log replay after live traffic,
+        restarts the window there rather than never expiring again.
+        """
+        if self.current_start is None:
+            self.current_start = now
+            return False
+        if now < self.current_start - self.bucket_seconds * len(self.buckets):
+            for bucket in self.buckets:
+                bucket.clear()
+            self.total.clear()
+            self.current_start = now
+            return True
+        steps = int((now - self.current_start) // self.bucket_seconds)
+        if steps <= 0:
+            return False
+        for _ in range(min(steps, len(self.buckets))):
+            self.current = (self.current + 1) % len(self.buckets)
+            expired = self.buckets[self.current]
+            self.total.subtract(expired)
+            expired.clear()
+        self.current_start += steps * self.bucket_seconds
+        return True
+
+    def indexes(self, key: str) -> List[int]:
+        return self.total.indexes(key)
+
+    def add(self, indexes: List[int], count: int = 1) -> int:
+        self.buckets[self.current].add(indexes, count)
+        return self.total.add(indexes, count)
+
+    def estimate(self, indexes: List[int]) -> int:
+        return self.total.estimate(indexes)
+
+
+class BurstDetector:
+    """Sliding-window request and block counters per source IP, with top talkers"""
+
+    def __init__(self, window: float = 60.0, buckets: int = 6, width: int = 2048, depth: int = 4,
+                 top_k: int = 100, request_threshold: int = 600, block_threshold: int = 30,
+                 block_ratio: float = 0.5, cooldown: float = 300.0):
+        self.window = window
+        self.bucket_seconds = window / buckets
+        self.requests = WindowedCountMin(window, buckets, width, depth)
+        self.blocked = WindowedCountMin(window, buckets, width, depth)
+        self.top_k = top_k
+        self.request_threshold = request_threshold
+        self.block_threshold = block_threshold
+        self.block_ratio = block_ratio
+        self.cooldown = cooldown
+        self._candidates: Dict[str, int] = {}
+        self._floor = 0
+        # (source_ip, kind) -> last alert time, capped like the candidate set
+        self._alerted: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def _advance(self, now: float) -> None:
+        if self.requests.advance(now) | self.blocked.advance(now):
+            # Window moved: re-rank candidates on their decayed estimates
+            for source_ip in list(self._candidates):
+                estimate = self.requests.estimate(self.requests.indexes(source_ip))
+                if estimate > 0:
+                    self._candidates[source_ip] = estimate
+                else:
+                    del self._candidates[source_ip]
+            self._floor = min(self._candidates.values(), default=0)
+
+    def _track(self, source_ip: str, estimate: int) -> None:
+        candidates = self._candidates
+        if source_ip in candidates or len(candidates) < self.top_k:
+            candidates[source_ip] = estimate
+            if len(candidates) == self.top_k:
+                self._floor = min(candidates.values())
+        elif estimate > self._floor:
+            del candidates[min(candidates, key=candidates.get)]
+            candidates[source_ip] = estimate
+            self._floor = min(candidates.values())
+
+    def observe(self, source_ip: str, requests: int = 1, blocked: int = 0,
+                now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Count requests from source_ip, returning any alerts they trigger"""
+        now = time.time() if now is None else now
+        self._advance(now)
+        # Both windows have the same shape, so one hash serves them
+        indexes = self.requests.indexes(source_ip)
+        request_count = self.requests.add(indexes, requests)
+        self._track(source_ip, request_count)
+
+        alerts = []
+        if request_count >= self.request_threshold:
+            alert = self._alert(source_ip, "request_rate", request_count, self.blocked.estimate(indexes), now)
+            if alert:
+                alerts.append(alert)
+        if blocked:
+            block_count = self.blocked.add(indexes, blocked)
+            if block_count >= self.block_threshold and block_count >= self.block_ratio * request_count:
+                alert = self._alert(source_ip, "block_rate", request_count, block_count, now)
+                if alert:
+                    alerts.append(alert)
+        return alerts
+
+    def observe_many(self, counts: Iterable[Tuple[Optional[float], str, int, int]]) -> List[Dict[str, Any]]:
+        """Count pre-aggregated (time, source_ip, requests, blocked) tuples, in time order.
+
+        Counts should be bucketed no coarser than one sub-window (window / buckets
+        seconds) so traffic spread over a long log is not judged as one burst.
+        """
+        alerts = []
+        for now, source_ip, requests, blocked in counts:
+            alerts.extend(self.observe(source_ip, requests, blocked, now))
+        return alerts
+
+    def _alert(self, source_ip: str, kind: str, requests: int, blocked: int, now: float) -> Optional[Dict[str, Any]]:
+        key = (source_ip, kind)
+        last = self._alerted.get(key)
+        if last is not None and 0 <= now - last < self.cooldown:
+            return None
+        self._alerted[key] = now
+        self._alerted.move_to_end(key)
+        while len(self._alerted) > self.top_k * 4:
+            self._alerted.popitem(last=False)
+
+        window = f"{self.window:g}s"
+        if kind == "request_rate":
+            title = "Request Rate Threshold Exceeded"
+            severity = "medium"
+            reason = f"over the limit of {self.request_threshold}"
+        else:
+            title = "Block Rate Threshold Exceeded"
+            severity = "high"
+            reason = f"at least {self.block_threshold} blocked and {self.block_ratio:.0%} of requests"
+        return {
+            "id": str(uuid.uuid4()),
+            "title": title,
+            "description": f"{source_ip} made {requests} requests ({blocked} blocked) in the last {window}, {reason}",
+            "severity": severity,
+            "source_ip": source_ip,
+            "destination": "multiple",
+            "policy_triggered": "Burst Detection",
+            "device_id": None,
+            "resolved": False,
+            "created_at": datetime.utcfromtimestamp(now),
+            "resolved_at": None,
+        }
+
+    def top_talkers(self, limit: int = 20, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Heaviest clients in the current window, by estimated request count"""
+        self._advance(time.time() if now is None else now)
+        talkers = []
+        for source_ip in self._candidates:
+            indexes = self.requests.indexes(source_ip)
+            requests = self.requests.estimate(indexes)
+            if requests:
+                blocked = min(self.blocked.estimate(indexes), requests)
+                talkers.append({"source_ip": source_ip, "requests": requests, "blocked": blocked})
+        talkers.sort(key=lambda talker: talker["requests"], reverse=True)
+        return talkers[:limit]
+
+
+def detector_from_env() -> BurstDetector:
+    """BurstDetector configured from BURST_* environment variables"""
+    return BurstDetector(
+        window=float(os.environ.get("BURST_WINDOW_SECONDS", "60")),
+        request_threshold=int(os.environ.get("BURST_REQUEST_THRESHOLD", "600")),
+        block_threshold=int(os.environ.get("BURST_BLOCK_THRESHOLD", "30")),
+        block_ratio=float(os.environ.get("BURST_BLOCK_RATIO", "0.5")),
+        cooldown=float(os.environ.get("BURST_ALERT_COOLDOWN_SECONDS", "300")),
+    )
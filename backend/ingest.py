@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Proxy log ingestion.
+
+Reads a Squid, FortiGate or CEF log in newline aligned chunks, parses and
+evaluates each chunk in a process pool, then bulk-writes the aggregated
+decision counters and the resulting security alerts. A policy alert for the
+same client, host and policy is raised at most once per cooldown of log time
+across chunks, while the decision counters still count every request. The
+byte offset is persisted after every chunk so an interrupted run resumes
+where it stopped.
+When following a file, the policies are recompiled whenever they change.
+
+    python ingest.py /var/log/squid/access.log --format squid --follow
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from accounting import DecisionAccountant, day_of, flush_decisions, source_segment, today
+from detector import detector_from_env
+from log_parsers import PARSERS
+from policy_engine import CompiledPolicySet, Rule, compile_rules, policies_fingerprint
+
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger("ingest")
+
+ALERT_SEVERITY = {"malware": "high", "adult_content": "high"}
+MAX_ALERTS_PER_CHUNK = 1000
+# Distinct (client, host, policy) alerts remembered for the cooldown
+MAX_ALERT_KEYS = 100_000
+TOP_TALKERS = 100
+_EPOCH = datetime(1970, 1, 1)
+
+_compiled: Optional[CompiledPolicySet] = None
+
+
+def _init_worker(rules: List[Rule]) -> None:
+    global _compiled
+    _compiled = CompiledPolicySet(rules)
+
+
+def _alert(source_ip: str, host: str, decision, count: int, seen_at: float) -> Dict[str, Any]:
+    """Build a document shaped like server.SecurityAlert, dated by the last matching log line.
+
+    created_at is None when the chunk has no timestamps; ingest dates those by
+    the last log time it saw.
+    """
+    verb = "Blocked" if decision.action == "block" else "Warned"
+    return {
+        "id": str(uuid.uuid4()),
+        "title": f"{verb} {(decision.category or 'custom').replace('_', ' ').title()} Access",
+        "description": f"{count} request(s) to {host} matched {decision.policy_name} ({decision.matched})",
+        "severity": "low" if decision.action == "warn" else ALERT_SEVERITY.get(decision.category, "medium"),
+        "source_ip": source_ip,
+        "destination": host,
+        "policy_triggered": decision.policy_name,
+        "device_id": None,
+        "resolved": False,
+        "created_at": datetime.utcfromtimestamp(seen_at) if seen_at else None,
+        "resolved_at": None,
+    }
+
+
+class PolicyAlertCooldown:
+    """Drops repeats of a policy alert for the same client, host and policy within `cooldown` seconds"""
+
+    def __init__(self, cooldown: float = 300.0, size: int = MAX_ALERT_KEYS):
+        self.cooldown = cooldown
+        self.size = size
+        self._alerted: "OrderedDict[Tuple[Any, ...], float]" = OrderedDict()
+
+    def filter(self, alerts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Alerts outside the cooldown of the last kept alert with the same key, dated by created_at"""
+        kept = []
+        for alert in alerts:
+            key = (alert["source_ip"], alert["destination"], alert["policy_triggered"], alert["title"])
+            now = (alert["created_at"] - _EPOCH).total_seconds()
+            last = self._alerted.get(key)
+            # Log time going backwards (a replayed or rotated file) alerts again
+            if last is not None and 0 <= now - last < self.cooldown:
+                continue
+            self._alerted[key] = now
+            self._alerted.move_to_end(key)
+            while len(self._alerted) > self.size:
+                self._alerted.popitem(last=False)
+            kept.append(alert)
+        return kept
+
+
+def process_chunk(data: bytes, log_format: str, bucket_seconds: float = 10.0) -> Tuple[
+        int, int, Counter, List[Dict[str, Any]], List[Tuple[Optional[float], str, int, int]], Optional[float]]:
+    """Parse and evaluate one chunk.
+
+    Returns line counts, decision counters, policy alerts, per-client
+    (bucket_time, source_ip, requests, blocked) totals in time order and the
+    latest log timestamp. Client totals are bucketed by log time in steps of
+    `bucket_seconds`; records without a timestamp count at the latest log time,
+    and only fall in a None bucket when the chunk has no timestamps at all.
+    """
+    parse = PARSERS[log_format]
+    evaluate = _compiled.evaluate_cached
+    counts: Counter = Counter()
+    flagged: Counter = Counter()
+    seen: Dict[Tuple[str, str, Any], float] = {}
+    requests: Counter = Counter()
+    blocked: Counter = Counter()
+    latest = 0.0
+    lines = parsed = 0
+    ingest_day = today()
+    for line in data.decode("utf-8", "replace").splitlines():
+        lines += 1
+        record = parse(line)
+        if record is None:
+            continue
+        parsed += 1
+        decision = evaluate(record.url)
+        segment = source_segment(record.source_ip)
+        day = day_of(record.timestamp) if record.timestamp else ingest_day
+        counts[(day, decision.action, decision.policy_id,
+                decision.category, record.host, segment)] += 1
+        if decision.action != "allow":
+            key = (record.source_ip, record.host, decision)
+            flagged[key] += 1
+            if record.timestamp > seen.get(key, 0.0):
+                seen[key] = record.timestamp
+        if record.source_ip:
+            timestamp = record.timestamp
+            client = (timestamp - timestamp % bucket_seconds if timestamp else None, record.source_ip)
+            requests[client] += 1
+            if decision.action == "block":
+                blocked[client] += 1
+        if record.timestamp > latest:
+            latest = record.timestamp
+    alerts = [
+        _alert(source_ip, host, decision, count, seen.get((source_ip, host, decision)) or latest)
+        for (source_ip, host, decision), count in flagged.most_common(MAX_ALERTS_PER_CHUNK)
+    ]
+    undated = [key for key in requests if key[0] is None]
+    if latest and undated:
+        # Records without a timestamp count at the chunk's latest log time
+        bucket = latest - latest % bucket_seconds
+        for key in undated:
+            requests[bucket, key[1]] += requests.pop(key)
+            if key in blocked:
+                blocked[bucket, key[1]] += blocked.pop(key)
+    talkers = sorted(
+        ((bucket, source_ip, count, blocked[bucket, source_ip]) for (bucket, source_ip), count in requests.items()),
+        key=lambda talker: talker[0] or 0.0,
+    )
+    return lines, parsed, counts, alerts, talkers, latest or None
+
+
+def read_chunk(handle, size: int, partial: bool) -> bytes:
+    """Read about `size` bytes ending on a line boundary.
+
+    A trailing line without a newline is only returned when `partial` is set;
+    otherwise the handle is rewound so it is read again once completed.
+    """
+    data = handle.read(size)
+    if data and not data.endswith(b"\n"):
+        data += handle.readline()
+        if not data.endswith(b"\n") and not partial:
+            cut = data.rfind(b"\n") + 1
+            handle.seek(cut - len(data), os.SEEK_CUR)
+            data = data[:cut]
+    return data
+
+
+async def load_offset(db, path: str, inode: int, size: int) -> int:
+    """Stored offset for this file, or 0 if it was rotated or truncated"""
+    state = await db.ingest_offsets.find_one({"path": path})
+    if not state or state.get("inode") != inode or state.get("offset", 0) > size:
+        return 0
+    return state["offset"]
+
+
+async def save_offset(db, path: str, inode: int, offset: int) -> None:
+    await db.ingest_offsets.update_one(
+        {"path": path},
+        {"$set": {"inode": inode, "offset": offset, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def save_top_talkers(db, path: str, talkers: List[Dict[str, Any]]) -> None:
+    """Publish this run's heaviest clients for the top talkers endpoint"""
+    await db.top_talkers.update_one(
+        {"source": f"ingest:{path}"},
+        {"$set": {"talkers": talkers, "updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+async def start_pool(db, workers: int) -> ProcessPoolExecutor:
+    """Process pool whose workers evaluate against the currently enabled policies"""
+    policies = await db.web_filtering_policies.find({"enabled": True}, {"_id": 0}).to_list(None)
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compile_rules(policies),))
+
+
+async def ingest(db, path: str, log_format: str, workers: int, chunk_bytes: int,
+                 follow: bool = False, poll_interval: float = 1.0, report_interval: float = 10.0,
+                 policy_interval: float = 30.0) -> Dict[str, Any]:
+    """Ingest a log file, returning totals for the run"""
+    path = str(Path(path).resolve())
+    fingerprint = await policies_fingerprint(db)
+    pool = await start_pool(db, workers)
+    policies_checked = time.perf_counter()
+    accountant = DecisionAccountant()
+    detector = detector_from_env()
+    cooldown = PolicyAlertCooldown(float(os.environ.get("POLICY_ALERT_COOLDOWN_SECONDS", "300")))
+    log_time: Optional[float] = None
+    loop = asyncio.get_running_loop()
+    totals = {"lines": 0, "parsed": 0, "alerts": 0, "bytes": 0}
+    started = last_report = time.perf_counter()
+    reported_lines = 0
+
+    try:
+        while True:
+            stat = os.stat(path)
+            offset = await load_offset(db, path, stat.st_ino, stat.st_size)
+            with open(path, "rb") as handle:
+                handle.seek(offset)
+                pending: deque = deque()
+                while True:
+                    if follow and time.perf_counter() - policies_checked >= policy_interval:
+                        policies_checked = time.perf_counter()
+                        state = await policies_fingerprint(db)
+                        if state != fingerprint:
+                            # Chunks already queued finish on the old pool and its policies
+                            pool.shutdown(wait=False)
+                            fingerprint, pool = state, await start_pool(db, workers)
+                            logger.info("Policies changed, recompiled them for new chunks")
+                    # Keep a bounded number of chunks in flight so memory stays flat
+                    while len(pending) < workers * 2:
+                        data = read_chunk(handle, chunk_bytes, partial=not follow)
+                        if not data:
+                            break
+                        future = loop.run_in_executor(pool, process_chunk, data, log_format, detector.bucket_seconds)
+                        pending.append((future, len(data)))
+                    if not pending:
+                        break
+                    future, size = pending.popleft()
+                    lines, parsed, counts, alerts, talkers, latest = await future
+                    accountant.merge(counts)
+                    # Bursts are judged on log time, so replaying an old file behaves like live traffic.
+                    # Chunks without timestamps count at the last log time seen, so the two never mix
+                    log_time = latest or log_time or time.time()
+                    for alert in alerts:
+                        if alert["created_at"] is None:
+                            alert["created_at"] = datetime.utcfromtimestamp(log_time)
+                    alerts = cooldown.filter(alerts)
+                    alerts.extend(detector.observe_many(
+                        (bucket if bucket is not None else log_time, source_ip, requests, blocked)
+                        for bucket, source_ip, requests, blocked in talkers
+                    ))
+                    await flush_decisions(db, accountant)
+                    if alerts:
+                        await db.security_alerts.insert_many(alerts, ordered=False)
+                    offset += size
+                    await save_offset(db, path, stat.st_ino, offset)
+                    await save_top_talkers(db, path, detector.top_talkers(TOP_TALKERS, now=log_time))
+                    totals["lines"] += lines
+                    totals["parsed"] += parsed
+                    totals["alerts"] += len(alerts)
+                    totals["bytes"] += size
+
+                    now = time.perf_counter()
+                    if now - last_report >= report_interval:
+                        rate = (totals["lines"] - reported_lines) / (now - last_report)
+                        logger.info(f"{totals['lines']} lines, {rate:,.0f} lines/s, offset {offset}")
+                        last_report, reported_lines = now, totals["lines"]
+            if not follow:
+                break
+            await asyncio.sleep(poll_interval)
+    finally:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - started
+    totals["elapsed_seconds"] = round(elapsed, 3)
+    totals["lines_per_second"] = round(totals["lines"] / elapsed) if elapsed else 0
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest proxy logs into decision counters and alerts")
+    parser.add_argument("path", help="log file to read")
+    parser.add_argument("--format", choices=sorted(PARSERS), default="squid", help="log format")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="parser processes")
+    parser.add_argument("--chunk-mb", type=float, default=4, help="chunk size handed to each worker")
+    parser.add_argument("--follow", action="store_true", help="keep tailing the file for new lines")
+    parser.add_argument("--poll", type=float, default=1.0, help="seconds between polls when following")
+    parser.add_argument("--report", type=float, default=10.0, help="seconds between progress reports")
+    parser.add_argument("--policy-check", type=float, default=30.0,
+                        help="seconds between checks for policy changes when following")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        totals = asyncio.run(ingest(
+            db, args.path, args.format, args.workers, int(args.chunk_mb * (1 << 20)),
+            follow=args.follow, poll_interval=args.poll, report_interval=args.report,
+            policy_interval=args.policy_check,
+        ))
+        logger.info(f"Ingested {totals['lines']} lines ({totals['parsed']} parsed, {totals['alerts']} alerts) "
+                    f"in {totals['elapsed_seconds']}s, {totals['lines_per_second']:,} lines/s")
+    except KeyboardInterrupt:
+        logger.info("Interrupted, offset saved at the last completed chunk")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Proxy log line parsers.
+
+Each parser turns one raw log line into a LogRecord, or returns None for lines
+it cannot use (headers, comments, malformed entries).
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple, Optional
+
+from policy_engine import normalize_host
+
+
+_FORTIGATE_FIELD = re.compile(r'(\w+)=(?:"([^"]*)"|(\S*))')
+_CEF_HEADER = re.compile(r"(?<!\\)\|")
+_CEF_FIELD = re.compile(r"(\w+)=((?:\\.|[^\\])*?)(?=\s+\w+=|\s*$)")
+
+
+class LogRecord(NamedTuple):
+    timestamp: float
+    source_ip: str
+    url: str
+    host: str
+
+
+def parse_squid(line: str) -> Optional[LogRecord]:
+    """Parse a Squid native access.log line
+
+    time elapsed client code/status bytes method URL user hierarchy/peer type
+    """
+    fields = line.split(None, 7)
+    if len(fields) < 7:
+        return None
+    try:
+        timestamp = float(fields[0])
+    except ValueError:
+        return None
+    url = fields[6]
+    host = normalize_host(url)
+    if not host:
+        return None
+    return LogRecord(timestamp, fields[2], url, host)
+
+
+@lru_cache(maxsize=4096)
+def _fortigate_time(date: str, clock: str) -> float:
+    try:
+        return (datetime.strptime(f"{date} {clock}", "%Y-%m-%d %H:%M:%S") - datetime(1970, 1, 1)).total_seconds()
+    except ValueError:
+        return 0.0
+
+
+def parse_fortigate(line: str) -> Optional[LogRecord]:
+    """Parse a FortiGate key=value web filter or traffic log line"""
+    if "hostname=" not in line:
+        return None
+    fields = {key: quoted if quoted else bare for key, quoted, bare in _FORTIGATE_FIELD.findall(line)}
+    host = normalize_host(fields.get("hostname", ""))
+    if not host:
+        return None
+    timestamp = _fortigate_time(fields.get("date", ""), fields.get("time", ""))
+    eventtime = fields.get("eventtime", "")
+    if eventtime.isdigit():
+        # eventtime is seconds on older firmware and nanoseconds on FortiOS 6.2+
+        timestamp = int(eventtime) / (1e9 if len(eventtime) > 12 else 1)
+    path = fields.get("url", "/")
+    return LogRecord(timestamp, fields.get("srcip", ""), f"{host}{path}", host)
+
+
+def parse_cef(line: str) -> Optional[LogRecord]:
+    """Parse an ArcSight CEF event, with or without a syslog prefix
+
+    CEF:Version|Vendor|Product|Version|Signature ID|Name|Severity|Extension
+    """
+    start = line.find("CEF:")
+    if start < 0:
+        return None
+    header = _CEF_HEADER.split(line[start:].rstrip("\r\n"), 7)
+    if len(header) < 8:
+        return None
+    fields = {key: value.replace("\\=", "=").replace("\\\\", "\\") for key, value in _CEF_FIELD.findall(header[7])}
+    url = fields.get("request") or fields.get("dhost", "")
+    host = normalize_host(url) or normalize_host(fields.get("dhost", ""))
+    if not host:
+        return None
+    receipt = fields.get("rt", "")
+    timestamp = int(receipt) / 1000 if receipt.isdigit() else 0.0
+    return LogRecord(timestamp, fields.get("src", ""), url, host)
+
+
+PARSERS: Dict[str, Callable[[str], Optional[LogRecord]]] = {
+    "squid": parse_squid,
+    "fortigate": parse_fortigate,
+    "cef": parse_cef,
+}
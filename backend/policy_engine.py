@@ -0,0 +1,489 @@
+"""
+Compiled web filtering policy engine.
+
+Policies are compiled once into a domain suffix index and a keyword matcher so
+that evaluating a URL costs a handful of dict lookups plus one keyword scan, no
+matter how many policies or domains are configured.
+"""
+
+import re
+import threading
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from itertools import accumulate, chain, repeat
+from operator import itemgetter
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+
+# Lower rank wins when two actions tie on priority
+ACTION_RANK = {"block": 0, "warn": 1, "allow": 2}
+DEFAULT_ACTION = "allow"
+
+# Up to this many keywords a str.find per keyword beats the trie regex scan
+KEYWORD_FIND_LIMIT = 128
+
+# Findings kept on a compiled set's analysis, requests get a prefix of them
+ANALYSIS_FINDINGS_LIMIT = 10000
+
+_PLAIN_DOMAIN = re.compile(r"[a-z0-9_-]+(?:\.[a-z0-9_-]+)*")
+# A newline separated list of plain domains, checked in one match per policy
+_PLAIN_DOMAINS = re.compile(r"[a-z0-9_-]+(?:[.\n][a-z0-9_-]+)*")
+
+
+class Rule(NamedTuple):
+    id: str
+    name: str
+    category: str
+    action: str
+    priority: int
+    domains: Tuple[str, ...]
+    keywords: Tuple[str, ...]
+
+
+class Decision(NamedTuple):
+    action: str
+    policy_id: Optional[str] = None
+    policy_name: Optional[str] = None
+    category: Optional[str] = None
+    matched: Optional[str] = None
+
+
+DEFAULT_DECISION = Decision(DEFAULT_ACTION)
+
+
+def _value(value: Any) -> Any:
+    return getattr(value, "value", value)
+
+
+def normalize_host(value: str) -> str:
+    """Reduce a URL, host or host:port string to a bare lowercase hostname"""
+    host = value.strip().lower()
+    scheme = host.find("://")
+    if scheme >= 0:
+        host = host[scheme + 3:]
+    for sep in "/?#":
+        cut = host.find(sep)
+        if cut >= 0:
+            host = host[:cut]
+    if "@" in host:
+        host = host.rsplit("@", 1)[1]
+    if host.startswith("["):
+        host = host[1:host.find("]")] if "]" in host else host[1:]
+    elif host.count(":") == 1:
+        host = host.split(":", 1)[0]
+    return host.strip(".")
+
+
+def normalize_domain(value: str) -> str:
+    """Normalize a policy domain entry, dropping wildcard prefixes"""
+    if _PLAIN_DOMAIN.fullmatch(value):
+        return value
+    host = normalize_host(value)
+    while host.startswith("*."):
+        host = host[2:]
+    return host
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """Return the normalized host and the lowercase text scanned for keywords"""
+    text = url.strip().lower()
+    scheme = text.find("://")
+    if scheme >= 0:
+        text = text[scheme + 3:]
+    return normalize_host(text), text
+
+
+def compile_rule(policy: Any) -> Rule:
+    """Build a Rule from a WebFilteringPolicy model or a raw Mongo document"""
+    if isinstance(policy, dict):
+        get = policy.get
+    else:
+        def get(key, default=None):
+            return getattr(policy, key, default)
+    listed = get("domains") or []
+    if _PLAIN_DOMAINS.fullmatch("\n".join(listed)):
+        domains = dict.fromkeys(listed)
+    else:
+        domains = dict.fromkeys(map(normalize_domain, listed))
+        domains.pop("", None)
+    keywords = dict.fromkeys(keyword.strip().lower() for keyword in get("keywords") or [])
+    keywords.pop("", None)
+    return Rule(
+        id=get("id"),
+        name=get("name"),
+        category=_value(get("category")),
+        action=_value(get("action")),
+        priority=get("priority", 1),
+        domains=tuple(domains),
+        keywords=tuple(keywords),
+    )
+
+
+def compile_rules(policies: Iterable[Any]) -> List[Rule]:
+    """Compile the enabled policies, passing already compiled rules through"""
+    rules = []
+    for policy in policies:
+        if isinstance(policy, Rule):
+            rules.append(policy)
+        elif policy.get("enabled", True) if isinstance(policy, dict) else getattr(policy, "enabled", True):
+            rules.append(compile_rule(policy))
+    return rules
+
+
+def rule_sort_key(rule: Rule) -> Tuple[int, int, str]:
+    return (rule.priority, ACTION_RANK.get(rule.action, len(ACTION_RANK)), rule.id or "")
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    branches = [re.escape(ch) + _trie_pattern(child) for ch, child in node.items() if ch]
+    if not branches:
+        return ""
+    body = "|".join(branches)
+    if "" in node:
+        return f"(?:{body})?"
+    return body if len(branches) == 1 else f"(?:{body})"
+
+
+class KeywordMatcher:
+    """Finds every occurrence of a set of keywords in a text.
+
+    Small keyword sets are scanned with one str.find per keyword. Larger sets
+    are folded into a trie shaped regex that matches the longest keyword
+    starting at a position; the scan restarts one character after each match
+    start so overlapping keywords are found, and shorter keywords that are
+    prefixes of the match are expanded from a precomputed table.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = sorted(set(k for k in keywords if k))
+        self._pattern = None
+        self._prefixes: Dict[str, List[str]] = {}
+        if len(self.keywords) > KEYWORD_FIND_LIMIT:
+            known = set(self.keywords)
+            trie: Dict[str, Any] = {}
+            for keyword in self.keywords:
+                node = trie
+                for ch in keyword:
+                    node = node.setdefault(ch, {})
+                node[""] = True
+            self._prefixes = {
+                keyword: [keyword[:i] for i in range(1, len(keyword) + 1) if keyword[:i] in known]
+                for keyword in self.keywords
+            }
+            self._pattern = re.compile(_trie_pattern(trie))
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (position, keyword) for every keyword occurrence in text"""
+        if self._pattern is None:
+            for keyword in self.keywords:
+                start = text.find(keyword)
+                while start >= 0:
+                    yield start, keyword
+                    start = text.find(keyword, start + 1)
+            return
+        prefixes = self._prefixes
+        search = self._pattern.search
+        match = search(text)
+        while match:
+            start = match.start()
+            for keyword in prefixes[match.group()]:
+                yield start, keyword
+            match = search(text, start + 1)
+
+    def find(self, text: str) -> Set[str]:
+        """Return the set of keywords occurring in text"""
+        if self._pattern is None:
+            return {keyword for keyword in self.keywords if keyword in text}
+        prefixes = self._prefixes
+        search = self._pattern.search
+        found: Set[str] = set()
+        match = search(text)
+        while match:
+            found.update(prefixes[match.group()])
+            match = search(text, match.start() + 1)
+        return found
+
+
+class CompiledPolicySet:
+    """Enabled policies compiled into rank ordered lookup structures.
+
+    Policies are ranked by priority (1 is evaluated first), then by action with
+    block before warn before allow, so the first matching rule always wins.
+    Each domain and keyword maps to the best ranked policy that lists it.
+    """
+
+    def __init__(self, policies: Iterable[Any], cache_size: int = 65536):
+        self.rules: List[Rule] = sorted(compile_rules(policies), key=rule_sort_key)
+        # Built worst ranked first so the best ranked policy listing an entry overwrites it
+        ranked = range(len(self.rules) - 1, -1, -1)
+        self.domains: Dict[str, int] = dict(zip(
+            chain.from_iterable(self.rules[index].domains for index in ranked),
+            chain.from_iterable(repeat(index, len(self.rules[index].domains)) for index in ranked),
+        ))
+        self.keywords: Dict[str, int] = dict(zip(
+            chain.from_iterable(self.rules[index].keywords for index in ranked),
+            chain.from_iterable(repeat(index, len(self.rules[index].keywords)) for index in ranked),
+        ))
+        self.matcher = KeywordMatcher(self.keywords)
+        # Decisions only change when the policies do, and a new set is compiled then
+        self.evaluate_cached = lru_cache(maxsize=cache_size)(self.evaluate)
+        self._analysis: Optional[Dict[str, Any]] = None
+        self._analysis_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match_host(self, host: str) -> Tuple[Optional[int], Optional[str]]:
+        """Best ranked policy whose domain list covers host or one of its parents"""
+        get = self.domains.get
+        best = get(host)
+        matched = host if best is not None else None
+        dot = host.find(".")
+        while dot >= 0:
+            suffix = host[dot + 1:]
+            index = get(suffix)
+            if index is not None and (best is None or index < best):
+                best, matched = index, suffix
+            dot = host.find(".", dot + 1)
+        return best, matched
+
+    def evaluate(self, url: str) -> Decision:
+        """Evaluate a URL against the compiled policies"""
+        host, text = split_url(url)
+        best, matched = self.match_host(host)
+        if self.matcher:
+            keywords = self.keywords
+            for keyword in self.matcher.find(text):
+                index = keywords[keyword]
+                if best is None or index < best:
+                    best, matched = index, keyword
+        if best is None:
+            return DEFAULT_DECISION
+        rule = self.rules[best]
+        return Decision(rule.action, rule.id, rule.name, rule.category, matched)
+
+    def analyze(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Find shadowed, redundant, conflicting and overlapping rules, see analyze_policies.
+
+        One analysis with up to ANALYSIS_FINDINGS_LIMIT findings is kept on the
+        set, which is replaced whenever the policies change, and each request
+        gets the first limit findings of it.
+        """
+        with self._analysis_lock:
+            if self._analysis is None:
+                self._analysis = analyze_policies(self, ANALYSIS_FINDINGS_LIMIT)
+            analysis = self._analysis
+        if limit is None or limit >= len(analysis["findings"]):
+            return analysis
+        return {**analysis, "findings": analysis["findings"][:limit], "truncated": True}
+
+
+def _contained_keywords(matcher: KeywordMatcher, values: List[str]) -> Dict[str, List[str]]:
+    """Keywords occurring inside each value, found in one scan of the joined values"""
+    contained: Dict[str, List[str]] = {}
+    if not matcher or not values:
+        return contained
+    # Start of each value in the joined text, every value followed by a newline
+    offsets = list(accumulate(map((1).__add__, map(len, values)), initial=0))
+    for start, keyword in matcher.finditer("\n".join(values)):
+        contained.setdefault(values[bisect_right(offsets, start) - 1], []).append(keyword)
+    return contained
+
+
+def _parent_domains(domain_index: Dict[str, int]) -> Dict[str, List[Tuple[int, str, str]]]:
+    """Listed parent domains of every listed domain that has any, nearest first"""
+    domains = list(domain_index)
+    suffixes = list(map(itemgetter(2), map(str.partition, domains, repeat("."))))
+    # Domains share few distinct parents, so each parent chain is walked once
+    chains: Dict[str, List[Tuple[int, str, str]]] = {}
+    for suffix in set(suffixes):
+        found = []
+        parent = suffix
+        while parent:
+            owner = domain_index.get(parent)
+            if owner is not None:
+                found.append((owner, parent, "domain"))
+            parent = parent.partition(".")[2]
+        if found:
+            chains[suffix] = found
+    if not chains:
+        return {}
+    return {domain: chains[suffix] for domain, suffix in zip(domains, suffixes) if suffix in chains}
+
+
+def _possible_overlaps(rules: List[Rule], reported: Set[Tuple[int, int]]) -> int:
+    """Policy pairs that may overlap through a keyword, counted without enumerating them"""
+    by_action: Dict[str, int] = {}
+    keyword_by_action: Dict[str, int] = {}
+    keyword_policies = []
+    for rule in rules:
+        if rule.domains or rule.keywords:
+            by_action[rule.action] = by_action.get(rule.action, 0) + 1
+        if rule.keywords:
+            keyword_policies.append(rule.action)
+            keyword_by_action[rule.action] = keyword_by_action.get(rule.action, 0) + 1
+
+    # Pairs of a keyword policy with any policy of another action, keyword pairs counted once
+    with_rules = sum(by_action.values())
+    pairs = sum(with_rules - by_action[action] for action in keyword_policies)
+    keyword_pairs = sum(len(keyword_policies) - keyword_by_action[action] for action in keyword_policies)
+    already = sum(1 for a, b in reported if rules[a].keywords or rules[b].keywords)
+    return pairs - keyword_pairs // 2 - already
+
+
+def analyze_policies(compiled: CompiledPolicySet, limit: Optional[int] = None) -> Dict[str, Any]:
+    """Find dead and overlapping rules across the whole policy set.
+
+    A domain rule is covered by the same domain or any parent domain listed
+    elsewhere, and by any keyword that occurs inside it; a keyword rule is
+    covered by any keyword that occurs inside it. Each rule only looks up its
+    own suffixes and keyword hits against the compiled indexes, which keeps
+    the analysis linear in the number of rules instead of pairwise.
+
+    - redundant: covered by a better ranked rule with the same action
+    - shadowed: covered by a rule with a different action and a stronger priority
+    - conflict: overlaps a rule with a different action at the same priority, so
+      only the block/warn/allow tie-break decides the outcome
+    - overlap: a keyword of a policy occurs inside a domain or keyword of a
+      better ranked policy with a different action, so that policy takes over
+      part of the keyword's URLs without covering it, e.g. allow keyword "tube"
+      inside block domain youtube.com. Reported once per policy pair, on the
+      worse ranked policy.
+
+    Any keyword can occur in any URL, so every keyword policy could overlap
+    every policy with a different action; that pair count is only returned as
+    possible_overlaps, since it grows quadratically and names no evidence.
+    """
+    rules = compiled.rules
+    domain_index = compiled.domains
+    keyword_index = compiled.keywords
+    domain_hits = _contained_keywords(compiled.matcher, list(domain_index))
+    keyword_hits = _contained_keywords(compiled.matcher, list(keyword_index))
+    parents = _parent_domains(domain_index)
+
+    findings: List[Dict[str, Any]] = []
+    counts = {"redundant": 0, "shadowed": 0, "conflict": 0, "overlap": 0}
+    covered = [0] * len(rules)
+    # Only domains with a parent, a keyword inside or a second listing can be covered
+    rules_analyzed = sum(len(rule.domains) + len(rule.keywords) for rule in rules)
+    interesting = set(parents)
+    interesting.update(domain_hits)
+    if sum(len(rule.domains) for rule in rules) != len(domain_index):
+        listings = Counter(chain.from_iterable(rule.domains for rule in rules))
+        interesting.update(domain for domain, count in listings.items() if count > 1)
+    # Policy pairs with different actions already reported, left out of the overlaps
+    reported: Set[Tuple[int, int]] = set()
+    # (worse, better) ranked policy pair -> the keyword and the rule it occurs in
+    overlaps: Dict[Tuple[int, int], Tuple[str, str, str]] = {}
+
+    def report(finding: str, rule: Rule, kind: str, value: str, by: Rule, by_kind: str, by_value: str):
+        if limit is None or len(findings) < limit:
+            findings.append({
+                "type": finding,
+                "policy_id": rule.id,
+                "policy_name": rule.name,
+                "rule_type": kind,
+                "rule": value,
+                "by_policy_id": by.id,
+                "by_policy_name": by.name,
+                "by_rule_type": by_kind,
+                "by_rule": by_value,
+            })
+
+    def classify(index: int, kind: str, value: str, candidates: List[Tuple[int, str, str]]):
+        rule = rules[index]
+        cover = None
+        for candidate in candidates:
+            if candidate[0] <= index and (cover is None or candidate[0] < cover[0]):
+                cover = candidate
+        if cover is not None:
+            by = rules[cover[0]]
+            if by.action == rule.action:
+                finding = "redundant"
+            elif by.priority == rule.priority:
+                finding = "conflict"
+            else:
+                finding = "shadowed"
+            covered[index] += 1
+            hit = cover
+        else:
+            hit = next((
+                c for c in candidates
+                if rules[c[0]].priority == rule.priority and rules[c[0]].action != rule.action
+            ), None)
+            if hit is None:
+                return
+            finding, by = "conflict", rules[hit[0]]
+        if by.action != rule.action:
+            reported.add((min(index, hit[0]), max(index, hit[0])))
+        counts[finding] += 1
+        report(finding, rule, kind, value, by, hit[2], hit[1])
+
+    for index, rule in enumerate(rules):
+        if interesting.isdisjoint(rule.domains):
+            domains: Iterable[str] = ()
+        else:
+            domains = rule.domains
+        for domain in domains:
+            owner = domain_index[domain]
+            candidates = parents.get(domain, [])
+            hits = domain_hits.get(domain)
+            if owner == index and not candidates and not hits:
+                continue
+            if owner != index:
+                candidates = candidates + [(owner, domain, "domain")]
+            if hits:
+                candidates = candidates + [(keyword_index[keyword], keyword, "keyword") for keyword in hits]
+                for keyword in hits:
+                    loser = keyword_index[keyword]
+                    if loser > index and rules[loser].action != rule.action:
+                        overlaps.setdefault((loser, index), (keyword, "domain", domain))
+            classify(index, "domain", domain, candidates)
+        for keyword in rule.keywords:
+            candidates = [
+                (keyword_index[found], found, "keyword")
+                for found in keyword_hits.get(keyword, ())
+                if found != keyword or keyword_index[found] != index
+            ]
+            if candidates:
+                classify(index, "keyword", keyword, candidates)
+            for found in keyword_hits.get(keyword, ()):
+                loser = keyword_index[found]
+                if loser > index and rules[loser].action != rule.action:
+                    overlaps.setdefault((loser, index), (found, "keyword", keyword))
+
+    for (loser, winner), (keyword, by_kind, by_value) in overlaps.items():
+        if (winner, loser) not in reported:
+            counts["overlap"] += 1
+            report("overlap", rules[loser], "keyword", keyword, rules[winner], by_kind, by_value)
+
+    dead_policies = [
+        {"policy_id": rule.id, "policy_name": rule.name}
+        for index, rule in enumerate(rules)
+        if covered[index] and covered[index] == len(rule.domains) + len(rule.keywords)
+    ]
+    return {
+        "policies_analyzed": len(rules),
+        "rules_analyzed": rules_analyzed,
+        "redundant": counts["redundant"],
+        "shadowed": counts["shadowed"],
+        "conflicts": counts["conflict"],
+        "overlaps": counts["overlap"],
+        "possible_overlaps": _possible_overlaps(rules, reported),
+        "dead_policies": dead_policies,
+        "findings": findings,
+        "truncated": sum(counts.values()) > len(findings),
+    }
+
+
+async def policies_fingerprint(db) -> Tuple[int, Any]:
+    """Cheap fingerprint of the enabled policies in Mongo: count and newest update"""
+    count = await db.web_filtering_policies.count_documents({"enabled": True})
+    newest = await db.web_filtering_policies.find_one(
+        {"enabled": True}, {"_id": 0, "updated_at": 1}, sort=[("updated_at", -1)]
+    )
+    return count, newest.get("updated_at") if newest else None
@@ -0,0 +1,279 @@
+"""
+In-process job scheduler.
+
+Runs async maintenance jobs on an interval or a cron schedule inside the API
+worker's event loop. A job never overlaps with itself in one process, and a
+job marked `leased` only runs on the worker currently holding its lease
+document in scheduler_leases, so a multi-worker deployment runs it once.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+
+logger = logging.getLogger("scheduler")
+
+MIN_LEASE_SECONDS = 30.0
+CRON_FIELDS = [("minute", 0, 59), ("hour", 0, 23), ("day", 1, 31), ("month", 1, 12), ("weekday", 0, 7)]
+CRON_ALIASES = {
+    "@hourly": "0 * * * *",
+    "@daily": "0 0 * * *",
+    "@weekly": "0 0 * * 0",
+    "@monthly": "0 0 1 * *",
+}
+
+
+def _cron_field(spec: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in spec.split(","):
+        step = 1
+        if "/" in part:
+            part, step_spec = part.split("/", 1)
+            step = int(step_spec)
+            if step < 1:
+                raise ValueError(f"Invalid cron step: {step_spec}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = int(part)
+            end = high if step > 1 else start
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron value out of range {low}-{high}: {part}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday)"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = CRON_ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        parsed = [_cron_field(spec, low, high) for spec, (_, low, high) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, self.weekdays = parsed
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        # Like cron, a restricted day-of-month and day-of-week match either one
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """First matching minute strictly after `moment`"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+
+class Job:
+    """A scheduled coroutine function and its run state"""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]], interval: Optional[float] = None,
+                 cron: Optional[str] = None, jitter: float = 0.0, leased: bool = True, run_at_start: bool = False,
+                 start_delay: float = 0.0):
+        if (interval is None) == (cron is None):
+            raise ValueError("A job needs exactly one of interval or cron")
+        if interval is not None and interval <= 0:
+            raise ValueError("Job interval must be positive")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = CronSchedule(cron) if cron else None
+        self.jitter = jitter
+        self.leased = leased
+        self.run_at_start = run_at_start
+        # Seconds after start() for the run_at_start run, so it does not compete with boot
+        self.start_delay = start_delay
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.next_run_at: Optional[datetime] = None
+
+    def next_after(self, moment: datetime) -> datetime:
+        if self.cron:
+            return self.cron.next_after(moment)
+        return moment + timedelta(seconds=self.interval)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "schedule": self.cron.expression if self.cron else f"every {self.interval:g}s",
+            "leased": self.leased,
+            "running": self.running,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "next_run_at": self.next_run_at,
+        }
+
+
+class MongoLease:
+    """Per-job leases kept as documents in a Mongo collection"""
+
+    def __init__(self, db, collection: str = "scheduler_leases", owner: Optional[str] = None):
+        # The collection is looked up on use so building a scheduler does not open the database
+        self.db = db
+        self.collection_name = collection
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def acquire(self, name: str, seconds: float) -> bool:
+        """Take or extend the lease on `name`, unless another live owner holds it"""
+        from pymongo.errors import DuplicateKeyError
+        now = datetime.utcnow()
+        try:
+            await self.db[self.collection_name].update_one(
+                {"_id": name, "$or": [{"owner": self.owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=seconds), "acquired_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The upsert collided with a lease document held by someone else
+            return False
+        return True
+
+    async def release(self, name: str) -> None:
+        await self.db[self.collection_name].delete_one({"_id": name, "owner": self.owner})
+
+
+class Scheduler:
+    """Runs registered jobs until stopped"""
+
+    def __init__(self, lease: Optional[MongoLease] = None):
+        self.lease = lease
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._runs: Set[asyncio.Task] = set()
+
+    def add_interval(self, name: str, func: Callable[[], Awaitable[Any]], seconds: float, **options) -> Job:
+        return self._add(Job(name, func, interval=seconds, **options))
+
+    def add_cron(self, name: str, func: Callable[[], Awaitable[Any]], expression: str, **options) -> Job:
+        return self._add(Job(name, func, cron=expression, **options))
+
+    def _add(self, job: Job) -> Job:
+        if job.name in self.jobs:
+            raise ValueError(f"Job already registered: {job.name}")
+        if job.leased and self.lease is None:
+            raise ValueError(f"Job {job.name} is leased but the scheduler has no lease store")
+        self.jobs[job.name] = job
+        if self._tasks:
+            self._tasks.append(asyncio.create_task(self._loop(job)))
+        return job
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._loop(job)) for job in self.jobs.values()]
+
+    async def stop(self) -> None:
+        """Stop scheduling, wait for in-flight runs and release held leases"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._runs:
+            await asyncio.gather(*self._runs, return_exceptions=True)
+        if self.lease:
+            for job in self.jobs.values():
+                if job.leased:
+                    try:
+                        await self.lease.release(job.name)
+                    except Exception as e:
+                        logger.error(f"Error releasing lease for {job.name}: {e}")
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [job.status() for job in self.jobs.values()]
+
+    async def _loop(self, job: Job) -> None:
+        now = datetime.utcnow()
+        job.next_run_at = now + timedelta(seconds=job.start_delay) if job.run_at_start else job.next_after(now)
+        jitter = 0.0 if job.run_at_start else job.jitter
+        while True:
+            # Jitter spreads identical schedules across workers and instances
+            delay = (job.next_run_at - datetime.utcnow()).total_seconds() + random.uniform(0, jitter)
+            jitter = job.jitter
+            await asyncio.sleep(max(0.0, delay))
+            scheduled = job.next_run_at
+            job.next_run_at = job.next_after(max(scheduled, datetime.utcnow()))
+            if job.running:
+                # Single flight: the previous run is still going
+                job.skipped += 1
+                continue
+            run = asyncio.create_task(self._run(job, scheduled))
+            self._runs.add(run)
+            run.add_done_callback(self._runs.discard)
+
+    def _lease_seconds(self, job: Job) -> float:
+        # Hold the lease until the next firing so other workers skip this one
+        return max(MIN_LEASE_SECONDS, (job.next_run_at - datetime.utcnow()).total_seconds() + job.jitter)
+
+    async def _run(self, job: Job, scheduled: datetime) -> None:
+        job.running = True
+        renew: Optional[asyncio.Task] = None
+        try:
+            if job.leased:
+                seconds = self._lease_seconds(job)
+                if not await self.lease.acquire(job.name, seconds):
+                    job.skipped += 1
+                    return
+                renew = asyncio.create_task(self._renew(job, seconds))
+            started = datetime.utcnow()
+            job.last_run_at = started
+            try:
+                await job.func()
+                job.last_error = None
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                logger.error(f"Error running job {job.name}: {e}")
+            job.runs += 1
+            job.last_duration = (datetime.utcnow() - started).total_seconds()
+        except Exception as e:
+            job.failures += 1
+            logger.error(f"Error acquiring lease for job {job.name}: {e}")
+        finally:
+            if renew:
+                renew.cancel()
+            job.running = False
+
+    async def _renew(self, job: Job, seconds: float) -> None:
+        """Keep the lease alive while a run outlasts it"""
+        while True:
+            await asyncio.sleep(seconds / 2)
+            try:
+                if not await self.lease.acquire(job.name, seconds):
+                    logger.warning(f"Lost lease for job {job.name} while it was running")
+                    return
+            except Exception as e:
+                logger.error(f"Error renewing lease for job {job.name}: {e}")
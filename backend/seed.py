@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Load-test dataset builder.
+
+Generates large, realistic datasets for benchmarking: thousands of policies,
+devices spread across CIDR ranges and tens of millions of alerts with skewed
+(Zipf-like) source, policy and destination distributions. Every batch draws
+from its own RNG seeded by (seed, collection, batch), so output is identical
+for a given seed no matter how many concurrent writers insert it.
+
+    python seed.py --policies 2000 --devices 100000 --alerts 20000000 --seed 42 --drop
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import accumulate
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from alert_search import ensure_search_indexes
+
+
+ROOT_DIR = Path(__file__).parent
+logger = logging.getLogger("seed")
+
+CATEGORIES = ["education", "research", "social_media", "streaming", "gaming", "malware", "adult_content", "custom"]
+CATEGORY_WEIGHTS = [10, 5, 15, 15, 10, 25, 10, 10]
+ACTIONS = {"education": "allow", "research": "allow"}
+SEVERITIES = ["low", "medium", "high", "critical"]
+SEVERITY_WEIGHTS = [50, 30, 15, 5]
+TLDS = ["com", "net", "org", "edu", "io", "tv", "co.uk", "info"]
+SYLLABLES = ["ka", "lo", "mi", "zu", "ten", "ra", "vo", "shi", "net", "pix", "tu", "bel", "cor", "dan", "fy", "gri"]
+INFRASTRUCTURE = ["router", "firewall", "switch", "utm", "server"]
+KEYWORDS = {
+    "education": ["education", "learning", "course", "lecture"],
+    "research": ["research", "journal", "paper", "dataset"],
+    "social_media": ["social", "chat", "messaging", "friends"],
+    "streaming": ["streaming", "video", "music", "live"],
+    "gaming": ["gaming", "games", "play", "esports"],
+    "malware": ["crack", "keygen", "payload", "phish"],
+    "adult_content": ["adult", "xxx", "nsfw", "casino"],
+    "custom": ["proxy", "vpn", "torrent", "warez"],
+}
+ALERT_TITLES = {
+    "block": "Blocked {category} Access",
+    "allow": "Policy Exception {category} Access",
+    "warn": "Warned {category} Access",
+}
+
+
+def batch_rng(seed: int, collection: str, batch: int) -> random.Random:
+    return random.Random(f"{seed}:{collection}:{batch}")
+
+
+def make_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def zipf_weights(size: int, exponent: float = 1.1) -> List[float]:
+    """Cumulative weights where item k is drawn with probability ~ 1/(k+1)^exponent"""
+    return list(accumulate(1.0 / (k + 1) ** exponent for k in range(size)))
+
+
+def domain_name(rng: random.Random) -> str:
+    label = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    if rng.random() < 0.2:
+        label = f"{rng.choice(['www', 'cdn', 'api', 'm'])}.{label}"
+    return f"{label}.{rng.choice(TLDS)}"
+
+
+def generate_policies(seed: int, batch: int, start: int, count: int, epoch: datetime) -> List[Dict[str, Any]]:
+    rng = batch_rng(seed, "policies", batch)
+    policies = []
+    for number in range(start, start + count):
+        category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+        created = epoch - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        policies.append({
+            "id": make_id(rng),
+            "name": f"{category.replace('_', ' ').title()} Policy {number}",
+            "description": f"Generated {category} policy {number}",
+            "category": category,
+            "action": ACTIONS.get(category, "warn" if rng.random() < 0.1 else "block"),
+            "domains": [domain_name(rng) for _ in range(rng.randint(5, 200))],
+            "keywords": rng.sample(KEYWORDS[category], rng.randint(0, 2)),
+            "enabled": rng.random() < 0.9,
+            "priority": rng.randint(1, 10),
+            "created_at": created,
+            "updated_at": created,
+        })
+    return policies
+
+
+def device_addresses(cidrs: Sequence[str], count: int) -> List[str]:
+    """First `count` host addresses, spread round-robin across the CIDR ranges"""
+    networks = [ipaddress.ip_network(cidr) for cidr in cidrs]
+    iterators = [network.hosts() for network in networks]
+    addresses: List[str] = []
+    while len(addresses) < count and iterators:
+        for iterator in list(iterators):
+            address = next(iterator, None)
+            if address is None:
+                iterators.remove(iterator)
+            else:
+                addresses.append(str(address))
+    return addresses[:count]
+
+
+def generate_devices(seed: int, batch: int, addresses: Sequence[str], start: int, epoch: datetime) -> List[Dict[str, Any]]:
+    rng = batch_rng(seed, "devices", batch)
+    devices = []
+    for number, address in enumerate(addresses, start):
+        infrastructure = address.endswith(".1") or rng.random() < 0.01
+        device_type = rng.choice(INFRASTRUCTURE) if infrastructure else "student_device"
+        segment = address.rsplit(".", 1)[0]
+        devices.append({
+            "id": make_id(rng),
+            "name": f"{device_type.replace('_', ' ').title()} {number}",
+            "device_type": device_type,
+            "ip_address": address,
+            "location": f"Segment {segment}.0/24",
+            "description": f"Generated {device_type} in {segment}.0/24",
+            "status": "active" if rng.random() < 0.95 else "inactive",
+            "position": {"x": float(number % 1000), "y": float(number // 1000)},
+            "connections": [f"switch-{segment}"],
+            "created_at": epoch - timedelta(minutes=rng.randint(0, 60 * 24 * 365)),
+        })
+    return devices
+
+
+class AlertSampler:
+    """Skewed draws over the seeded devices and policies"""
+
+    def __init__(self, devices: List[Dict[str, Any]], policies: List[Dict[str, Any]], epoch: datetime, days: int):
+        self.devices = devices
+        self.policies = policies
+        self.device_weights = zipf_weights(len(devices))
+        self.policy_weights = zipf_weights(len(policies))
+        self.epoch = epoch
+        self.span = days * 86400
+
+    def generate(self, seed: int, batch: int, count: int) -> List[Dict[str, Any]]:
+        rng = batch_rng(seed, "alerts", batch)
+        devices = rng.choices(self.devices, cum_weights=self.device_weights, k=count)
+        policies = rng.choices(self.policies, cum_weights=self.policy_weights, k=count)
+        severities = rng.choices(SEVERITIES, SEVERITY_WEIGHTS, k=count)
+        alerts = []
+        for device, policy, severity in zip(devices, policies, severities):
+            # Square of a uniform draw skews timestamps towards the most recent days
+            created = self.epoch - timedelta(seconds=self.span * rng.random() ** 2)
+            resolved = rng.random() < 0.6
+            domains = policy["domains"]
+            destination = domains[min(int(rng.paretovariate(1.5)) - 1, len(domains) - 1)]
+            category = policy["category"].replace("_", " ").title()
+            alerts.append({
+                "id": make_id(rng),
+                "title": ALERT_TITLES[policy["action"]].format(category=category),
+                "description": f"Request from {device['ip_address']} to {destination} matched {policy['name']}",
+                "severity": severity,
+                "source_ip": device["ip_address"],
+                "destination": destination,
+                "policy_triggered": policy["name"],
+                "device_id": device["id"],
+                "resolved": resolved,
+                "created_at": created,
+                "resolved_at": created + timedelta(minutes=rng.randint(1, 600)) if resolved else None,
+            })
+        return alerts
+
+
+async def write_batches(collection, total: int, batch_size: int, writers: int,
+                        generate: Callable[[int, int, int], List[Dict[str, Any]]]) -> int:
+    """Insert `total` documents in batches, with up to `writers` insert_many calls in flight"""
+    slots = asyncio.Semaphore(writers)
+    tasks = []
+    written = 0
+    started = time.perf_counter()
+
+    async def write(documents: List[Dict[str, Any]]) -> None:
+        nonlocal written
+        try:
+            await collection.insert_many(documents, ordered=False)
+            written += len(documents)
+        finally:
+            slots.release()
+
+    for batch, start in enumerate(range(0, total, batch_size)):
+        await slots.acquire()
+        documents = generate(batch, start, min(batch_size, total - start))
+        tasks.append(asyncio.create_task(write(documents)))
+        if batch and batch % 100 == 0:
+            tasks = [task for task in tasks if not task.done()]
+            rate = written / (time.perf_counter() - started)
+            logger.info(f"{collection.name}: {written}/{total} ({rate:,.0f} docs/s)")
+    await asyncio.gather(*tasks)
+    return written
+
+
+async def seed_database(db, seed: int = 42, policies: int = 2000, devices: int = 100000,
+                        alerts: int = 1000000, cidrs: Sequence[str] = ("10.0.0.0/14",),
+                        batch_size: int = 5000, writers: int = 8, days: int = 30,
+                        epoch: datetime = datetime(2026, 1, 1), drop: bool = False) -> Dict[str, int]:
+    """Generate and insert a reproducible dataset, returning the counts written"""
+    if drop:
+        # Dropping is O(1) where deleting 20M alerts is not; the search indexes are rebuilt below
+        for name in ("web_filtering_policies", "network_devices", "security_alerts"):
+            await db[name].drop()
+
+    policy_batch = max(1, batch_size // 50)
+    policy_docs: List[Dict[str, Any]] = []
+
+    def policy_batch_of(batch: int, start: int, count: int) -> List[Dict[str, Any]]:
+        documents = generate_policies(seed, batch, start, count, epoch)
+        policy_docs.extend(documents)
+        return documents
+
+    addresses = device_addresses(cidrs, devices)
+    if len(addresses) < devices:
+        logger.warning(f"CIDR ranges only hold {len(addresses)} hosts, seeding that many devices")
+    device_docs: List[Dict[str, Any]] = []
+
+    def device_batch_of(batch: int, start: int, count: int) -> List[Dict[str, Any]]:
+        documents = generate_devices(seed, batch, addresses[start:start + count], start, epoch)
+        device_docs.extend(documents)
+        return documents
+
+    written = {
+        "policies": await write_batches(db.web_filtering_policies, policies, policy_batch, writers, policy_batch_of),
+        "devices": await write_batches(db.network_devices, len(addresses), batch_size, writers, device_batch_of),
+    }
+    if alerts and policy_docs and device_docs:
+        # Alerts only keep the fields they reference, not whole policy documents
+        sampler = AlertSampler(
+            [{"id": d["id"], "ip_address": d["ip_address"]} for d in device_docs],
+            [{k: p[k] for k in ("name", "category", "action", "domains")} for p in policy_docs],
+            epoch, days,
+        )
+        written["alerts"] = await write_batches(
+            db.security_alerts, alerts, batch_size, writers,
+            lambda batch, start, count: sampler.generate(seed, batch, count),
+        )
+    if written.get("alerts") or drop:
+        # Build the search indexes here rather than on the first search request
+        started = time.perf_counter()
+        await ensure_search_indexes(db)
+        logger.info(f"security_alerts search indexes ready in {time.perf_counter() - started:.1f}s")
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed MongoDB with a reproducible load-test dataset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--policies", type=int, default=2000)
+    parser.add_argument("--devices", type=int, default=100000)
+    parser.add_argument("--alerts", type=int, default=1000000)
+    parser.add_argument("--cidr", action="append", help="device address range, repeatable (default 10.0.0.0/14)")
+    parser.add_argument("--days", type=int, default=30, help="alert history length")
+    parser.add_argument("--epoch", default="2026-01-01", help="newest alert timestamp, YYYY-MM-DD")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=8, help="concurrent insert_many calls")
+    parser.add_argument("--drop", action="store_true", help="drop the policies, devices and alerts collections first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    load_dotenv(ROOT_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    started = time.perf_counter()
+    try:
+        written = asyncio.run(seed_database(
+            db, seed=args.seed, policies=args.policies, devices=args.devices, alerts=args.alerts,
+            cidrs=args.cidr or ["10.0.0.0/14"], batch_size=args.batch_size, writers=args.writers,
+            days=args.days, epoch=datetime.strptime(args.epoch, "%Y-%m-%d"), drop=args.drop,
+        ))
+        logger.info(f"Seeded {written} in {time.perf_counter() - started:.1f}s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
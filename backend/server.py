@@ -1,24 +1,61 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Response
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
+from accounting import DecisionAccountant, counter_filter, flush_decisions, today
+from alert_search import ensure_search_indexes, search_filter, search_pipeline, search_result, split_search_text
+from database import LazyDatabase
+from detector import detector_from_env
+from policy_engine import ANALYSIS_FINDINGS_LIMIT, CompiledPolicySet, normalize_host, policies_fingerprint
+from scheduler import MongoLease, Scheduler
+from singleflight import SingleFlight
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection, opened on first use
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+database = LazyDatabase(mongo_url, os.environ['DB_NAME'])
+db = database
+
+# Proxy logs the simulator may replay
+TRAFFIC_LOG_DIR = Path(os.environ.get('TRAFFIC_LOG_DIR', ROOT_DIR / 'logs')).resolve()
+
+# Background maintenance jobs
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Seconds after boot before warming the policy cache and checking the search indexes,
+# so the first requests do not queue behind the Mongo connect; negative skips both
+STARTUP_WARMUP_DELAY = float(os.environ.get('STARTUP_WARMUP_DELAY', '30'))
+# Opt-in: resolved alerts were never deleted before, and seeded benchmark data must stay put
+ALERT_RETENTION_DAYS = int(os.environ.get('ALERT_RETENTION_DAYS', '0'))
+
+# Bulk alert resolution: larger sets run in the background in chunks
+BULK_RESOLVE_SYNC_LIMIT = int(os.environ.get('BULK_RESOLVE_SYNC_LIMIT', '10000'))
+BULK_RESOLVE_CHUNK = int(os.environ.get('BULK_RESOLVE_CHUNK', '5000'))
+
+# Alert search reads at most this many matching alerts per query
+ALERT_SEARCH_SCAN_LIMIT = int(os.environ.get('ALERT_SEARCH_SCAN_LIMIT', '10000'))
+ALERT_SEARCH_MAX_PAGE_SIZE = 200
+ALERT_SEARCH_FACET_SIZE = 20
+# A text search waits this long for a missing text index before answering 503
+ALERT_SEARCH_INDEX_WAIT = float(os.environ.get('ALERT_SEARCH_INDEX_WAIT', '5'))
+
+# Worker boot timings, in ms since this module started importing
+startup_timings: Dict[str, float] = {}
 
 # Create the main app without a prefix
 app = FastAPI(title="Campus Web Access Security System", description="Cisco Virtual Internship - Web Filtering & Network Security")
@@ -113,6 +150,12 @@ class NetworkDeviceCreate(BaseModel):
     position: Dict[str, float] = {"x": 0, "y": 0}
     connections: List[str] = []
 
+class TopTalker(BaseModel):
+    source_ip: str
+    requests: int
+    blocked: int
+    block_rate: float
+
 # Security Alert Models
 class SecurityAlert(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -136,6 +179,37 @@ class SecurityAlertCreate(BaseModel):
     policy_triggered: Optional[str] = None
     device_id: Optional[str] = None
 
+class FacetCount(BaseModel):
+    value: Optional[str] = None
+    count: int
+
+class AlertSearchResult(BaseModel):
+    total: int
+    total_exact: bool
+    page: int
+    page_size: int
+    hits: List[SecurityAlert]
+    facets: Dict[str, List[FacetCount]]
+    # False when the facets only count the newest ALERT_SEARCH_SCAN_LIMIT matches
+    facets_exact: bool
+
+class AlertResolveRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    severity: Optional[AlertSeverity] = None
+    source_ip: Optional[str] = None
+    policy_triggered: Optional[str] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+class AlertResolveResult(BaseModel):
+    operation_id: Optional[str] = None
+    status: str
+    total: int
+    modified_count: int
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
 # Dashboard Statistics Model
 class DashboardStats(BaseModel):
     total_policies: int
@@ -147,13 +221,142 @@ class DashboardStats(BaseModel):
     blocked_requests_today: int
     allowed_requests_today: int
 
+# Policy Analysis Models
+class PolicyFinding(BaseModel):
+    type: str
+    policy_id: str
+    policy_name: str
+    rule_type: str
+    rule: str
+    by_policy_id: str
+    by_policy_name: str
+    by_rule_type: str
+    by_rule: str
+
+class PolicyAnalysis(BaseModel):
+    policies_analyzed: int
+    rules_analyzed: int
+    redundant: int
+    shadowed: int
+    conflicts: int
+    overlaps: int
+    possible_overlaps: int
+    dead_policies: List[Dict[str, str]]
+    findings: List[PolicyFinding]
+    truncated: bool
+
+# Policy Evaluation and Simulation Models
+class PolicyEvaluationRequest(BaseModel):
+    url: str
+    source_ip: Optional[str] = None
+
+class PolicyEvaluation(BaseModel):
+    url: str
+    action: PolicyAction
+    policy_id: Optional[str] = None
+    policy_name: Optional[str] = None
+    category: Optional[PolicyCategory] = None
+    matched: Optional[str] = None
+
+class SimulationSource(str, Enum):
+    ACCOUNTING = "accounting"
+    LOG = "log"
+
+class PolicySimulationRequest(BaseModel):
+    source: SimulationSource = SimulationSource.ACCOUNTING
+    log_file: Optional[str] = None
+    log_format: str = "squid"
+    days: Optional[int] = None
+    updates: Dict[str, WebFilteringPolicyUpdate] = {}
+    new_policies: List[WebFilteringPolicyCreate] = []
+    removed_policy_ids: List[str] = []
+    workers: Optional[int] = None
+    top: int = 20
+
+class SimulationGroup(BaseModel):
+    key: str
+    changed: int
+    transitions: Dict[str, int]
+
+class PolicySimulation(BaseModel):
+    total_requests: int
+    changed_requests: int
+    transitions: Dict[str, int]
+    by_category: List[SimulationGroup]
+    by_host: List[SimulationGroup]
+    by_segment: List[SimulationGroup]
+    elapsed_seconds: float
+
+# Compiled policy cache, rebuilt on first use after any policy change
+_compiled_policies: Optional[CompiledPolicySet] = None
+_policies_version = 0
+_policies_fingerprint: Optional[tuple] = None
+# Concurrent misses share one compile instead of each fetching and compiling every policy
+_compile_flight = SingleFlight()
+
+def invalidate_compiled_policies():
+    """Drop the compiled policy set so the next lookup recompiles it"""
+    global _compiled_policies, _policies_version
+    _compiled_policies = None
+    _policies_version += 1
+    _compile_flight.forget("policies")
+
+async def _compile_policies() -> CompiledPolicySet:
+    """Compile the enabled policies, or join the compile already in flight"""
+    return await _compile_flight.do("policies", _build_compiled_policies)
+
+async def _build_compiled_policies() -> CompiledPolicySet:
+    """Compile the enabled policies, storing the result unless a change raced it"""
+    global _compiled_policies, _policies_fingerprint
+    version = _policies_version
+    fingerprint = await policies_fingerprint(db)
+    policies = await db.web_filtering_policies.find({"enabled": True}, {"_id": 0}).to_list(None)
+    compiled = await run_in_threadpool(CompiledPolicySet, policies)
+    if version == _policies_version:
+        _compiled_policies, _policies_fingerprint = compiled, fingerprint
+    return compiled
+
+async def get_compiled_policies() -> CompiledPolicySet:
+    """Get the compiled set of enabled policies"""
+    compiled = _compiled_policies
+    if compiled is None:
+        compiled = await _compile_policies()
+    return compiled
+
+async def refresh_compiled_policies():
+    """Recompile ahead of requests when another worker changed the policies"""
+    if _compiled_policies is None or await policies_fingerprint(db) != _policies_fingerprint:
+        await _compile_policies()
+
+# Decisions counted by the evaluate endpoint, flushed to decision_counters in bulk
+decision_accountant = DecisionAccountant()
+
+# Per-client sliding-window request and block counts from the evaluate endpoint
+burst_detector = detector_from_env()
+
+# Identical concurrent reads share one query and one serialized response body
+read_flights = SingleFlight()
+_policy_list = TypeAdapter(List[WebFilteringPolicy])
+_device_list = TypeAdapter(List[NetworkDevice])
+
+async def coalesced_json(key: str, load) -> Response:
+    """Respond with the JSON body built by load(), shared with concurrent identical requests"""
+    return Response(content=await read_flights.do(key, load), media_type="application/json")
+
+async def _load_policies() -> bytes:
+    policies = await db.web_filtering_policies.find({}, {"_id": 0}).to_list(1000)
+    return _policy_list.dump_json(_policy_list.validate_python(policies))
+
+async def _load_devices() -> bytes:
+    devices = await db.network_devices.find({}, {"_id": 0}).to_list(1000)
+    return _device_list.dump_json(_device_list.validate_python(devices))
+
 # Policy Management Endpoints
 @api_router.get("/policies", response_model=List[WebFilteringPolicy])
 async def get_policies():
     """Get all web filtering policies"""
     try:
-        policies = await db.web_filtering_policies.find().to_list(1000)
-        return [WebFilteringPolicy(**policy) for policy in policies]
+        return await coalesced_json("policies", _load_policies)
     except Exception as e:
         logger.error(f"Error fetching policies: {e}")
         raise HTTPException(status_code=500, detail="Error fetching policies")
@@ -164,11 +367,90 @@ async def create_policy(policy: WebFilteringPolicyCreate):
     try:
         policy_obj = WebFilteringPolicy(**policy.dict())
         await db.web_filtering_policies.insert_one(policy_obj.dict())
+        invalidate_compiled_policies()
+        read_flights.forget("policies", "dashboard_stats")
         return policy_obj
     except Exception as e:
         logger.error(f"Error creating policy: {e}")
         raise HTTPException(status_code=500, detail="Error creating policy")
 
+@api_router.get("/policies/analyze", response_model=PolicyAnalysis)
+async def analyze_policies(limit: int = Query(1000, ge=1, le=ANALYSIS_FINDINGS_LIMIT)):
+    """Find shadowed, redundant, conflicting and keyword-overlapping rules across all enabled policies"""
+    try:
+        compiled = await get_compiled_policies()
+        return await run_in_threadpool(compiled.analyze, limit)
+    except Exception as e:
+        logger.error(f"Error analyzing policies: {e}")
+        raise HTTPException(status_code=500, detail="Error analyzing policies")
+
+@api_router.post("/policies/evaluate", response_model=PolicyEvaluation)
+async def evaluate_url(request: PolicyEvaluationRequest):
+    """Evaluate a URL against the enabled policies and count the decision"""
+    try:
+        compiled = await get_compiled_policies()
+        decision = compiled.evaluate_cached(request.url)
+        if decision_accountant.record(decision, normalize_host(request.url), request.source_ip):
+            await flush_decisions(db, decision_accountant)
+        if request.source_ip:
+            alerts = burst_detector.observe(request.source_ip, blocked=int(decision.action == "block"))
+            if alerts:
+                await db.security_alerts.insert_many(alerts)
+                read_flights.forget("dashboard_stats")
+        return PolicyEvaluation(url=request.url, **decision._asdict())
+    except Exception as e:
+        logger.error(f"Error evaluating url: {e}")
+        raise HTTPException(status_code=500, detail="Error evaluating url")
+
+@api_router.post("/policies/simulate", response_model=PolicySimulation)
+async def simulate_policies(request: PolicySimulationRequest):
+    """Replay stored traffic against the current policies and a proposed change"""
+    # Imported here: the process pool machinery is only needed by simulations
+    from simulation import simulate_counters, simulate_log
+    try:
+        current = await db.web_filtering_policies.find({}, {"_id": 0}).to_list(None)
+        removed = set(request.removed_policy_ids)
+        proposed = []
+        for policy in current:
+            if policy["id"] in removed:
+                continue
+            update = request.updates.get(policy["id"])
+            if update is not None:
+                policy = {**policy, **{k: v for k, v in update.dict().items() if v is not None}}
+            proposed.append(policy)
+        proposed.extend(WebFilteringPolicy(**policy.dict()).dict() for policy in request.new_policies)
+
+        if request.source == SimulationSource.LOG:
+            if not request.log_file:
+                raise HTTPException(status_code=400, detail="log_file is required for log simulations")
+            log_path = (TRAFFIC_LOG_DIR / request.log_file).resolve()
+            if TRAFFIC_LOG_DIR not in log_path.parents or not log_path.is_file():
+                raise HTTPException(status_code=404, detail="Log file not found")
+            return await run_in_threadpool(
+                simulate_log, str(log_path), request.log_format, current, proposed,
+                workers=request.workers, top=request.top
+            )
+
+        fields = ("host", "segment", "policy_id", "category")
+        pipeline = [
+            {"$match": counter_filter(request.days)},
+            {"$group": {"_id": {field: f"${field}" for field in fields}, "count": {"$sum": "$count"}}},
+        ]
+        samples = [
+            tuple(group["_id"].get(field) for field in fields) + (group["count"],)
+            async for group in db.decision_counters.aggregate(pipeline)
+        ]
+        return await run_in_threadpool(
+            simulate_counters, samples, current, proposed, workers=request.workers, top=request.top
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error simulating policies: {e}")
+        raise HTTPException(status_code=500, detail="Error simulating policies")
+
 @api_router.get("/policies/{policy_id}", response_model=WebFilteringPolicy)
 async def get_policy(policy_id: str):
     """Get a specific web filtering policy"""
@@ -197,6 +479,8 @@ async def update_policy(policy_id: str, policy_update: WebFilteringPolicyUpdate)
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Policy not found")
+        invalidate_compiled_policies()
+        read_flights.forget("policies", "dashboard_stats")
         
         updated_policy = await db.web_filtering_policies.find_one({"id": policy_id})
         return WebFilteringPolicy(**updated_policy)
@@ -213,6 +497,8 @@ async def delete_policy(policy_id: str):
         result = await db.web_filtering_policies.delete_one({"id": policy_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Policy not found")
+        invalidate_compiled_policies()
+        read_flights.forget("policies", "dashboard_stats")
         return {"message": "Policy deleted successfully"}
     except HTTPException:
         raise
@@ -225,8 +511,7 @@ async def delete_policy(policy_id: str):
 async def get_network_devices():
     """Get all network devices"""
     try:
-        devices = await db.network_devices.find().to_list(1000)
-        return [NetworkDevice(**device) for device in devices]
+        return await coalesced_json("devices", _load_devices)
     except Exception as e:
         logger.error(f"Error fetching devices: {e}")
         raise HTTPException(status_code=500, detail="Error fetching devices")
@@ -237,6 +522,7 @@ async def create_network_device(device: NetworkDeviceCreate):
     try:
         device_obj = NetworkDevice(**device.dict())
         await db.network_devices.insert_one(device_obj.dict())
+        read_flights.forget("devices", "dashboard_stats")
         return device_obj
     except Exception as e:
         logger.error(f"Error creating device: {e}")
@@ -251,6 +537,7 @@ async def update_network_device(device_id: str, device_update: NetworkDeviceCrea
             {"id": device_id}, 
             {"$set": update_data}
         )
+        read_flights.forget("devices", "dashboard_stats")
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Device not found")
@@ -268,6 +555,7 @@ async def delete_network_device(device_id: str):
     """Delete a network device"""
     try:
         result = await db.network_devices.delete_one({"id": device_id})
+        read_flights.forget("devices", "dashboard_stats")
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Device not found")
         return {"message": "Device deleted successfully"}
@@ -277,6 +565,30 @@ async def delete_network_device(device_id: str):
         logger.error(f"Error deleting device: {e}")
         raise HTTPException(status_code=500, detail="Error deleting device")
 
+@api_router.get("/network/top-talkers", response_model=List[TopTalker])
+async def get_top_talkers(limit: int = 20):
+    """Get the clients with the most requests in the current burst detection window"""
+    try:
+        totals: Dict[str, List[int]] = {}
+        talkers = burst_detector.top_talkers(limit * 2)
+        # Ingest runs publish their own top talkers; include those still inside the window
+        since = datetime.utcnow() - timedelta(seconds=burst_detector.window)
+        async for snapshot in db.top_talkers.find({"updated_at": {"$gte": since}}, {"_id": 0, "talkers": 1}):
+            talkers.extend(snapshot.get("talkers", []))
+        for talker in talkers:
+            counts = totals.setdefault(talker["source_ip"], [0, 0])
+            counts[0] += talker["requests"]
+            counts[1] += talker["blocked"]
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)[:limit]
+        return [
+            TopTalker(source_ip=source_ip, requests=requests, blocked=blocked,
+                      block_rate=round(blocked / requests, 4) if requests else 0.0)
+            for source_ip, (requests, blocked) in ranked
+        ]
+    except Exception as e:
+        logger.error(f"Error fetching top talkers: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching top talkers")
+
 # Security Alerts Endpoints
 @api_router.get("/alerts", response_model=List[SecurityAlert])
 async def get_security_alerts():
@@ -288,12 +600,61 @@ async def get_security_alerts():
         logger.error(f"Error fetching alerts: {e}")
         raise HTTPException(status_code=500, detail="Error fetching alerts")
 
+# Set once the search indexes are known to exist in this worker's database
+_search_indexes_ready = False
+_search_index_flight = SingleFlight()
+
+async def require_search_indexes():
+    """Make sure the text index exists before a $text search, whether or not the scheduler built it"""
+    if _search_indexes_ready:
+        return
+    try:
+        # The build is shared and keeps running if this request stops waiting for it
+        await asyncio.wait_for(
+            _search_index_flight.do("search_indexes", ensure_alert_search_indexes), ALERT_SEARCH_INDEX_WAIT
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Alert search index is being built, retry shortly",
+                            headers={"Retry-After": "30"})
+
+@api_router.get("/alerts/search", response_model=AlertSearchResult)
+async def search_security_alerts(q: Optional[str] = None, severity: Optional[AlertSeverity] = None,
+                                 policy_triggered: Optional[str] = None, device_id: Optional[str] = None,
+                                 source_ip: Optional[str] = None, destination: Optional[str] = None,
+                                 resolved: Optional[bool] = None, created_after: Optional[datetime] = None,
+                                 created_before: Optional[datetime] = None, page: int = 1, page_size: int = 50):
+    """Search alerts by text and filters, with facet counts by severity, policy and device"""
+    try:
+        if page < 1 or not 1 <= page_size <= ALERT_SEARCH_MAX_PAGE_SIZE:
+            raise HTTPException(status_code=400, detail=f"page must be >= 1 and page_size 1-{ALERT_SEARCH_MAX_PAGE_SIZE}")
+        text, hosts = split_search_text(q)
+        if text:
+            await require_search_indexes()
+        query = search_filter(
+            {"severity": severity.value if severity else None, "policy_triggered": policy_triggered,
+             "device_id": device_id, "source_ip": source_ip, "destination": destination},
+            resolved=resolved, created_after=created_after, created_before=created_before, hosts=hosts,
+        )
+        pipeline = search_pipeline(
+            query, text, skip=(page - 1) * page_size, limit=page_size,
+            scan_limit=ALERT_SEARCH_SCAN_LIMIT, facet_size=ALERT_SEARCH_FACET_SIZE,
+        )
+        documents = await db.security_alerts.aggregate(pipeline).to_list(1)
+        result = search_result(documents[0] if documents else {}, ALERT_SEARCH_SCAN_LIMIT)
+        return AlertSearchResult(page=page, page_size=page_size, **result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching alerts: {e}")
+        raise HTTPException(status_code=500, detail="Error searching alerts")
+
 @api_router.post("/alerts", response_model=SecurityAlert)
 async def create_security_alert(alert: SecurityAlertCreate):
     """Create a new security alert"""
     try:
         alert_obj = SecurityAlert(**alert.dict())
         await db.security_alerts.insert_one(alert_obj.dict())
+        read_flights.forget("dashboard_stats")
         return alert_obj
     except Exception as e:
         logger.error(f"Error creating alert: {e}")
@@ -307,6 +668,7 @@ async def resolve_alert(alert_id: str):
             {"id": alert_id},
             {"$set": {"resolved": True, "resolved_at": datetime.utcnow()}}
         )
+        read_flights.forget("dashboard_stats")
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Alert not found")
@@ -318,41 +680,169 @@ async def resolve_alert(alert_id: str):
         logger.error(f"Error resolving alert: {e}")
         raise HTTPException(status_code=500, detail="Error resolving alert")
 
+def alert_resolve_query(request: AlertResolveRequest) -> Dict[str, Any]:
+    """Mongo filter for the unresolved alerts a bulk resolve request selects"""
+    query: Dict[str, Any] = {"resolved": False}
+    if request.ids is not None:
+        query["id"] = {"$in": request.ids}
+    for field in ("severity", "source_ip", "policy_triggered"):
+        value = getattr(request, field)
+        if value is not None:
+            query[field] = value.value if isinstance(value, Enum) else value
+    created = {}
+    if request.created_after:
+        created["$gte"] = request.created_after
+    if request.created_before:
+        created["$lt"] = request.created_before
+    if created:
+        query["created_at"] = created
+    return query
+
+# Background bulk resolve tasks of this worker, kept referenced until they finish
+_resolve_tasks = set()
+
+async def _resolve_in_chunks(operation_id: str, query: Dict[str, Any], resolved_at: datetime):
+    """Resolve matching alerts a chunk at a time, recording progress on the operation"""
+    status, error = "completed", None
+    try:
+        while True:
+            cursor = db.security_alerts.find(query, {"_id": 0, "id": 1}).limit(BULK_RESOLVE_CHUNK)
+            chunk = await cursor.to_list(BULK_RESOLVE_CHUNK)
+            if not chunk:
+                break
+            result = await db.security_alerts.update_many(
+                {"id": {"$in": [alert["id"] for alert in chunk]}, "resolved": False},
+                {"$set": {"resolved": True, "resolved_at": resolved_at}}
+            )
+            await db.alert_operations.update_one(
+                {"operation_id": operation_id}, {"$inc": {"modified_count": result.modified_count}}
+            )
+            read_flights.forget("dashboard_stats")
+    except asyncio.CancelledError:
+        status, error = "interrupted", "Server shut down before the operation finished"
+        raise
+    except Exception as e:
+        logger.error(f"Error resolving alerts in operation {operation_id}: {e}")
+        status, error = "failed", str(e)
+    finally:
+        await db.alert_operations.update_one(
+            {"operation_id": operation_id},
+            {"$set": {"status": status, "error": error, "finished_at": datetime.utcnow()}}
+        )
+
+@api_router.put("/alerts/resolve", response_model=AlertResolveResult)
+async def resolve_alerts(request: AlertResolveRequest, response: Response):
+    """Resolve every unresolved alert matching an ID list or a filter"""
+    try:
+        query = alert_resolve_query(request)
+        if len(query) == 1:
+            raise HTTPException(status_code=400, detail="Provide alert ids or at least one filter")
+        resolved_at = datetime.utcnow()
+        total = await db.security_alerts.count_documents(query)
+        if total <= BULK_RESOLVE_SYNC_LIMIT:
+            result = await db.security_alerts.update_many(
+                query, {"$set": {"resolved": True, "resolved_at": resolved_at}}
+            )
+            read_flights.forget("dashboard_stats")
+            return AlertResolveResult(status="completed", total=total, modified_count=result.modified_count,
+                                      created_at=resolved_at, finished_at=datetime.utcnow())
+
+        operation = AlertResolveResult(operation_id=str(uuid.uuid4()), status="running", total=total,
+                                       modified_count=0, created_at=resolved_at)
+        await db.alert_operations.insert_one(operation.dict())
+        task = asyncio.create_task(_resolve_in_chunks(operation.operation_id, query, resolved_at))
+        _resolve_tasks.add(task)
+        task.add_done_callback(_resolve_tasks.discard)
+        response.status_code = 202
+        return operation
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error resolving alerts: {e}")
+        raise HTTPException(status_code=500, detail="Error resolving alerts")
+
+@api_router.get("/alerts/resolve/{operation_id}", response_model=AlertResolveResult)
+async def get_alert_resolve_operation(operation_id: str):
+    """Get the progress of a background bulk resolve"""
+    try:
+        operation = await db.alert_operations.find_one({"operation_id": operation_id}, {"_id": 0})
+        if not operation:
+            raise HTTPException(status_code=404, detail="Operation not found")
+        return AlertResolveResult(**operation)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching resolve operation: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching resolve operation")
+
 # Dashboard Statistics Endpoint
+async def _load_dashboard_stats() -> str:
+    # Count policies
+    total_policies = await db.web_filtering_policies.count_documents({})
+    active_policies = await db.web_filtering_policies.count_documents({"enabled": True})
+    
+    # Count devices
+    total_devices = await db.network_devices.count_documents({})
+    active_devices = await db.network_devices.count_documents({"status": "active"})
+    
+    # Count alerts
+    total_alerts = await db.security_alerts.count_documents({})
+    unresolved_alerts = await db.security_alerts.count_documents({"resolved": False})
+    
+    # Request counts from decision accounting (evaluate endpoint and log ingestion)
+    requests_today = {"block": 0, "allow": 0}
+    pipeline = [
+        {"$match": {"day": today()}},
+        {"$group": {"_id": "$action", "count": {"$sum": "$count"}}},
+    ]
+    async for group in db.decision_counters.aggregate(pipeline):
+        requests_today[group["_id"]] = group["count"]
+    blocked_requests_today = requests_today["block"]
+    allowed_requests_today = requests_today["allow"]
+    
+    stats = DashboardStats(
+        total_policies=total_policies,
+        active_policies=active_policies,
+        total_devices=total_devices,
+        active_devices=active_devices,
+        total_alerts=total_alerts,
+        unresolved_alerts=unresolved_alerts,
+        blocked_requests_today=blocked_requests_today,
+        allowed_requests_today=allowed_requests_today
+    )
+    return stats.model_dump_json()
+
 @api_router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        # Count policies
-        total_policies = await db.web_filtering_policies.count_documents({})
-        active_policies = await db.web_filtering_policies.count_documents({"enabled": True})
-        
-        # Count devices
-        total_devices = await db.network_devices.count_documents({})
-        active_devices = await db.network_devices.count_documents({"status": "active"})
-        
-        # Count alerts
-        total_alerts = await db.security_alerts.count_documents({})
-        unresolved_alerts = await db.security_alerts.count_documents({"resolved": False})
-        
-        # Simulated request counts (in a real system, this would come from logs)
-        blocked_requests_today = 142
-        allowed_requests_today = 2891
-        
-        return DashboardStats(
-            total_policies=total_policies,
-            active_policies=active_policies,
-            total_devices=total_devices,
-            active_devices=active_devices,
-            total_alerts=total_alerts,
-            unresolved_alerts=unresolved_alerts,
-            blocked_requests_today=blocked_requests_today,
-            allowed_requests_today=allowed_requests_today
-        )
+        return await coalesced_json("dashboard_stats", _load_dashboard_stats)
     except Exception as e:
         logger.error(f"Error fetching dashboard stats: {e}")
         raise HTTPException(status_code=500, detail="Error fetching dashboard stats")
 
+@api_router.get("/metrics/coalescing")
+async def get_coalescing_metrics():
+    """Get how many read requests this worker served from a shared in-flight query"""
+    routes = read_flights.stats()
+    requests = sum(route["requests"] for route in routes.values())
+    coalesced = sum(route["coalesced"] for route in routes.values())
+    return {
+        "requests": requests,
+        "coalesced": coalesced,
+        "coalesced_ratio": round(coalesced / requests, 4) if requests else 0.0,
+        "routes": routes,
+    }
+
+@api_router.get("/health")
+async def health_check():
+    """Get worker liveness and boot timings without touching the database"""
+    return {
+        "status": "ok",
+        "database_connected": database.connected,
+        "startup": startup_timings,
+    }
+
 # Initialize Demo Data Endpoint
 @api_router.post("/demo/initialize")
 async def initialize_demo_data():
@@ -407,9 +897,8 @@ async def initialize_demo_data():
             }
         ]
         
-        for policy_data in demo_policies:
-            policy = WebFilteringPolicy(**policy_data)
-            await db.web_filtering_policies.insert_one(policy.dict())
+        await db.web_filtering_policies.insert_many([WebFilteringPolicy(**policy_data).dict() for policy_data in demo_policies])
+        invalidate_compiled_policies()
         
         # Create demo network devices
         demo_devices = [
@@ -455,9 +944,7 @@ async def initialize_demo_data():
             }
         ]
         
-        for device_data in demo_devices:
-            device = NetworkDevice(**device_data)
-            await db.network_devices.insert_one(device.dict())
+        await db.network_devices.insert_many([NetworkDevice(**device_data).dict() for device_data in demo_devices])
         
         # Create demo security alerts
         demo_alerts = [
@@ -493,9 +980,8 @@ async def initialize_demo_data():
             }
         ]
         
-        for alert_data in demo_alerts:
-            alert = SecurityAlert(**alert_data)
-            await db.security_alerts.insert_one(alert.dict())
+        await db.security_alerts.insert_many([SecurityAlert(**alert_data).dict() for alert_data in demo_alerts])
+        read_flights.forget("policies", "devices", "dashboard_stats")
         
         return {"message": "Demo data initialized successfully"}
     except Exception as e:
@@ -520,6 +1006,78 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Scheduled jobs
+async def flush_decision_counters():
+    """Write counters the evaluate endpoint accumulated in this worker"""
+    await flush_decisions(db, decision_accountant)
+
+async def expire_resolved_alerts():
+    """Delete resolved alerts older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(days=ALERT_RETENTION_DAYS)
+    result = await db.security_alerts.delete_many({"resolved": True, "resolved_at": {"$lt": cutoff}})
+    if result.deleted_count:
+        logger.info(f"Expired {result.deleted_count} resolved alerts older than {ALERT_RETENTION_DAYS} days")
+
+async def ensure_alert_search_indexes():
+    """Create the alert search indexes if they are missing"""
+    global _search_indexes_ready
+    await ensure_search_indexes(db)
+    _search_indexes_ready = True
+
+def build_scheduler() -> Scheduler:
+    """Register the maintenance jobs; per-worker state is refreshed on every worker"""
+    jobs = Scheduler(MongoLease(db))
+    jobs.add_interval("flush_decision_counters", flush_decision_counters, 10, jitter=2, leased=False)
+    jobs.add_interval("refresh_compiled_policies", refresh_compiled_policies, 30, jitter=5, leased=False)
+    # Built once by whichever worker holds the lease, a while after boot; a text
+    # search arriving before that builds them itself
+    jobs.add_cron("ensure_search_indexes", ensure_alert_search_indexes, "@daily", jitter=60,
+                  run_at_start=STARTUP_WARMUP_DELAY >= 0, start_delay=max(STARTUP_WARMUP_DELAY, 0.0))
+    if ALERT_RETENTION_DAYS > 0:
+        jobs.add_cron("expire_resolved_alerts", expire_resolved_alerts, "17 3 * * *", jitter=60)
+    return jobs
+
+scheduler: Optional[Scheduler] = None
+
+@app.on_event("startup")
+async def start_scheduler():
+    global scheduler
+    if SCHEDULER_ENABLED:
+        scheduler = build_scheduler()
+        scheduler.start()
+
+_warmup_task: Optional[asyncio.Task] = None
+
+async def _warm_compiled_policies():
+    try:
+        await asyncio.sleep(STARTUP_WARMUP_DELAY)
+        await get_compiled_policies()
+    except Exception as e:
+        logger.error(f"Error warming compiled policies: {e}")
+
+@app.on_event("startup")
+async def warm_compiled_policies():
+    """Compile the policies in the background, once boot is over, so evaluate requests do not pay for it"""
+    global _warmup_task
+    if STARTUP_WARMUP_DELAY >= 0:
+        _warmup_task = asyncio.create_task(_warm_compiled_policies())
+
+@app.on_event("startup")
+async def report_startup():
+    startup_timings["ready_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
+    logger.info(f"Worker ready in {startup_timings['ready_ms']}ms "
+                f"(server import {startup_timings['import_ms']}ms)")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if scheduler:
+        await scheduler.stop()
+    if _warmup_task:
+        _warmup_task.cancel()
+    for task in list(_resolve_tasks):
+        task.cancel()
+    await asyncio.gather(*_resolve_tasks, return_exceptions=True)
+    await flush_decisions(db, decision_accountant)
+    database.close()
+
+startup_timings["import_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
@@ -0,0 +1,210 @@
+"""
+What-if policy simulation.
+
+Replays a stored traffic sample against the current and a proposed policy
+snapshot in one pass and summarizes which requests would change outcome, by
+category, host and source segment. Work is split across a process pool: log
+files by byte range, stored counters by batch.
+
+Decision counters only keep the host, so a path or query keyword match cannot
+be replayed from them. Both snapshots evaluate the host, and a keyword policy
+that made the stored decision is assumed to still match that traffic in any
+snapshot that contains it. Proposals that change keyword matching are
+rejected in favour of a log file replay.
+"""
+
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from accounting import source_segment
+from log_parsers import PARSERS
+from policy_engine import CompiledPolicySet, Rule, compile_rules, rule_sort_key
+
+
+# (url, host, segment, count)
+TrafficSample = Tuple[str, str, str, int]
+# (host, segment, policy_id, category, count) from decision_counters
+CounterSample = Tuple[str, str, Optional[str], Optional[str], int]
+
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_BYTES = 1 << 20
+RECORD_BATCH = 50000
+
+_current: Optional[CompiledPolicySet] = None
+_proposed: Optional[CompiledPolicySet] = None
+_current_rules: Dict[str, Rule] = {}
+_proposed_rules: Dict[str, Rule] = {}
+
+
+def _init_worker(current: List[Rule], proposed: List[Rule]) -> None:
+    global _current, _proposed, _current_rules, _proposed_rules
+    _current = CompiledPolicySet(current)
+    _proposed = CompiledPolicySet(proposed)
+    _current_rules = {rule.id: rule for rule in _current.rules}
+    _proposed_rules = {rule.id: rule for rule in _proposed.rules}
+
+
+def _replay(samples: Iterable[TrafficSample]) -> Tuple[Counter, Counter]:
+    """Evaluate samples against both snapshots, keeping only the changed ones"""
+    before_of = _current.evaluate_cached
+    after_of = _proposed.evaluate_cached
+    transitions: Counter = Counter()
+    changes: Counter = Counter()
+    for url, host, segment, count in samples:
+        before = before_of(url)
+        after = after_of(url)
+        transition = f"{before.action}->{after.action}"
+        transitions[transition] += count
+        if before.action != after.action:
+            category = after.category or before.category or "uncategorized"
+            changes[(category, host, segment, transition)] += count
+    return transitions, changes
+
+
+def _counter_decision(compiled: CompiledPolicySet, rules: Dict[str, Rule], host: str,
+                      policy_id: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Action and category of a counter's host in one snapshot.
+
+    The keyword policy that made the stored decision still matches the
+    traffic, as long as the snapshot has it and nothing better ranked matches
+    the host.
+    """
+    decision = compiled.evaluate_cached(host)
+    kept = rules.get(policy_id)
+    if kept is not None and kept.keywords and (
+            decision.policy_id is None or rule_sort_key(kept) < rule_sort_key(rules[decision.policy_id])):
+        return kept.action, kept.category
+    return decision.action, decision.category
+
+
+def _replay_counters(samples: Iterable[CounterSample]) -> Tuple[Counter, Counter]:
+    """Replay counters against both snapshots, keeping only the changed ones"""
+    transitions: Counter = Counter()
+    changes: Counter = Counter()
+    for host, segment, policy_id, category, count in samples:
+        before_action, before_category = _counter_decision(_current, _current_rules, host, policy_id)
+        after_action, after_category = _counter_decision(_proposed, _proposed_rules, host, policy_id)
+        transition = f"{before_action}->{after_action}"
+        transitions[transition] += count
+        if before_action != after_action:
+            category = after_category or before_category or category or "uncategorized"
+            changes[(category, host, segment, transition)] += count
+    return transitions, changes
+
+
+def keyword_changes(current: List[Dict[str, Any]], proposed: List[Dict[str, Any]]) -> List[str]:
+    """Names of the policies whose keyword matching differs between the snapshots"""
+    def keyword_rules(policies):
+        return {rule.id: rule for rule in compile_rules(policies) if rule.keywords}
+
+    before, after = keyword_rules(current), keyword_rules(proposed)
+    changed = []
+    for policy_id in sorted(before.keys() | after.keys()):
+        old, new = before.get(policy_id), after.get(policy_id)
+        if old is None or new is None or (
+                (old.action, old.priority, old.keywords) != (new.action, new.priority, new.keywords)):
+            changed.append((old or new).name)
+    return changed
+
+
+def _read_log_range(path: str, start: int, end: int, log_format: str) -> Iterable[TrafficSample]:
+    """Yield samples for the lines that begin inside [start, end)"""
+    parse = PARSERS[log_format]
+    with open(path, "rb") as handle:
+        if start:
+            handle.seek(start - 1)
+            position = start - 1 + len(handle.readline())
+        else:
+            position = 0
+        for raw in handle:
+            if position >= end:
+                break
+            position += len(raw)
+            record = parse(raw.decode("utf-8", "replace"))
+            if record is not None:
+                yield record.url, record.host, source_segment(record.source_ip), 1
+
+
+def _replay_log_range(path: str, start: int, end: int, log_format: str) -> Tuple[Counter, Counter]:
+    return _replay(_read_log_range(path, start, end, log_format))
+
+
+def _log_ranges(path: str, workers: int) -> List[Tuple[int, int]]:
+    size = os.path.getsize(path)
+    chunk = max(MIN_CHUNK_BYTES, -(-size // (workers * CHUNKS_PER_WORKER)))
+    return [(start, min(start + chunk, size)) for start in range(0, size, chunk)]
+
+
+def summarize(transitions: Counter, changes: Counter, top: int = 20) -> Dict[str, Any]:
+    """Fold per-sample changes into the diff summary returned by the API"""
+    groups: Dict[str, Dict[str, Counter]] = {"category": {}, "host": {}, "segment": {}}
+    for (category, host, segment, transition), count in changes.items():
+        for dimension, key in (("category", category), ("host", host), ("segment", segment)):
+            groups[dimension].setdefault(key, Counter())[transition] += count
+
+    def ranked(dimension: str) -> List[Dict[str, Any]]:
+        rows = [
+            {"key": key, "changed": sum(counts.values()), "transitions": dict(counts)}
+            for key, counts in groups[dimension].items()
+        ]
+        rows.sort(key=lambda row: (-row["changed"], row["key"]))
+        return rows[:top]
+
+    return {
+        "total_requests": sum(transitions.values()),
+        "changed_requests": sum(changes.values()),
+        "transitions": dict(transitions),
+        "by_category": ranked("category"),
+        "by_host": ranked("host"),
+        "by_segment": ranked("segment"),
+    }
+
+
+def _workers(requested: Optional[int]) -> int:
+    """Requested pool size, capped at the CPU count"""
+    cpus = os.cpu_count() or 1
+    return max(1, min(requested or cpus, cpus))
+
+
+def _run(tasks: Sequence[Tuple[Any, ...]], function, current, proposed, workers: Optional[int], top: int):
+    started = time.perf_counter()
+    transitions: Counter = Counter()
+    changes: Counter = Counter()
+    if tasks:
+        # Workers receive plain rule tuples, cheap to pickle and free of model classes
+        initargs = (compile_rules(current), compile_rules(proposed))
+        with ProcessPoolExecutor(max_workers=min(_workers(workers), len(tasks)), initializer=_init_worker,
+                                 initargs=initargs) as pool:
+            for partial_transitions, partial_changes in pool.map(function, *zip(*tasks)):
+                transitions.update(partial_transitions)
+                changes.update(partial_changes)
+    summary = summarize(transitions, changes, top)
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def simulate_log(path: str, log_format: str, current: List[Dict[str, Any]], proposed: List[Dict[str, Any]],
+                 workers: Optional[int] = None, top: int = 20) -> Dict[str, Any]:
+    """Replay a proxy log file against both policy snapshots"""
+    if log_format not in PARSERS:
+        raise ValueError(f"Unsupported log format: {log_format}")
+    workers = _workers(workers)
+    tasks = [(path, start, end, log_format) for start, end in _log_ranges(path, workers)]
+    return _run(tasks, _replay_log_range, current, proposed, workers, top)
+
+
+def simulate_counters(samples: Sequence[CounterSample], current: List[Dict[str, Any]],
+                      proposed: List[Dict[str, Any]], workers: Optional[int] = None,
+                      top: int = 20) -> Dict[str, Any]:
+    """Replay aggregated decision counters against both snapshots"""
+    changed = keyword_changes(current, proposed)
+    if changed:
+        raise ValueError(
+            "Decision counters do not keep URL paths, so keyword changes cannot be simulated from them "
+            f"({', '.join(changed[:5])}); replay a log file instead"
+        )
+    tasks = [(samples[i:i + RECORD_BATCH],) for i in range(0, len(samples), RECORD_BATCH)]
+    return _run(tasks, _replay_counters, current, proposed, workers, top)
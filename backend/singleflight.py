@@ -0,0 +1,55 @@
+"""
+Request coalescing.
+
+Concurrent callers asking for the same key share one in-flight call instead of
+each running it. Nothing is cached: once the shared call finishes, the next
+caller starts a fresh one.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key and counts how many were shared"""
+
+    def __init__(self):
+        self._flights: Dict[str, asyncio.Future] = {}
+        self._requests: Dict[str, int] = {}
+        self._executions: Dict[str, int] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await func(), or the call already in flight for key"""
+        self._requests[key] = self._requests.get(key, 0) + 1
+        flight = self._flights.get(key)
+        if flight is None:
+            self._executions[key] = self._executions.get(key, 0) + 1
+            # The call runs as its own task so a disconnecting first caller
+            # does not cancel it for everyone else waiting on it
+            flight = asyncio.ensure_future(func())
+            self._flights[key] = flight
+            flight.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(flight)
+
+    def _finish(self, key: str, flight: asyncio.Future) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            flight.exception()
+
+    def forget(self, *keys: str) -> None:
+        """Stop sharing in-flight calls for keys, e.g. after a write changed their data"""
+        for key in keys:
+            self._flights.pop(key, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            key: {
+                "requests": requests,
+                "executions": self._executions.get(key, 0),
+                "coalesced": requests - self._executions.get(key, 0),
+                "in_flight": int(key in self._flights),
+            }
+            for key, requests in self._requests.items()
+        }
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Load and latency benchmark for the Campus Web Access Security System API.
+
+Drives each route with a configurable number of concurrent async clients and
+reports throughput and p50/p95/p99 latency per route as JSON. By default the
+FastAPI app runs in-process on a mongomock database seeded with seed.py, so
+results are comparable across commits; --base-url targets a running server.
+The evaluate route posts a seeded set of URLs built from the served policies,
+listed and unlisted hosts with and without keywords, so with the default
+sizes every timed evaluation misses the decision cache.
+
+    python benchmarks/api_bench.py --concurrency 32 --requests 2000 --output bench.json
+    python benchmarks/api_bench.py --compare bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+# route name -> (method, path); evaluate posts the URLs from evaluate_urls in turn
+ROUTES: Dict[str, Tuple[str, str]] = {
+    "policies": ("GET", "/api/policies"),
+    "devices": ("GET", "/api/network/devices"),
+    "alerts": ("GET", "/api/alerts"),
+    "search": ("GET", "/api/alerts/search?severity=high&resolved=false&page_size=50"),
+    "stats": ("GET", "/api/dashboard/stats"),
+    "evaluate": ("POST", "/api/policies/evaluate"),
+    "analyze": ("GET", "/api/policies/analyze"),
+}
+
+
+async def evaluate_urls(client: httpx.AsyncClient, count: int, seed: int) -> List[str]:
+    """Seeded mix of URLs on listed and unlisted hosts, half with a policy keyword in the path"""
+    rng = random.Random(seed)
+    try:
+        response = await client.get("/api/policies")
+        response.raise_for_status()
+        policies = [policy for policy in response.json() if policy.get("domains") or policy.get("keywords")]
+    except httpx.HTTPError:
+        policies = []
+    domains = [domain.lstrip("*.") for policy in policies for domain in policy.get("domains", [])]
+    keywords = [keyword for policy in policies for keyword in policy.get("keywords", [])]
+    urls = []
+    for i in range(count):
+        if domains and i % 2:
+            host = f"{rng.choice(['www', 'cdn', 'api', 'm'])}.{rng.choice(domains)}"
+        else:
+            host = f"host{rng.randrange(1 << 20)}.example.{rng.choice(['com', 'net', 'org', 'edu'])}"
+        path = f"/{rng.choice(keywords)}/{i}" if keywords and i % 4 >= 2 else f"/page/{i}"
+        urls.append(f"https://{host}{path}?ref={rng.randrange(1 << 16)}")
+    return urls
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    rank = max(1, round(fraction * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+async def drive(client: httpx.AsyncClient, route: str, requests: int, concurrency: int,
+                warmup: int, urls: List[str]) -> Dict[str, Any]:
+    """Send `requests` calls to one route from `concurrency` concurrent clients, after `warmup` untimed ones"""
+    method, path = ROUTES[route]
+    latencies: List[float] = []
+    errors = 0
+    issued = warmup
+
+    async def call(sequence: int) -> Tuple[bool, float]:
+        body = None
+        if route == "evaluate":
+            body = {"url": urls[sequence % len(urls)], "source_ip": f"10.0.{sequence % 64}.7"}
+        started = time.perf_counter()
+        response = await client.request(method, path, json=body)
+        return response.status_code < 400, (time.perf_counter() - started) * 1000
+
+    async def worker() -> None:
+        nonlocal issued, errors
+        while issued < warmup + requests:
+            sequence = issued
+            issued += 1
+            try:
+                ok, elapsed = await call(sequence)
+            except httpx.HTTPError:
+                ok, elapsed = False, 0.0
+            if not ok:
+                errors += 1
+            else:
+                latencies.append(elapsed)
+
+    for sequence in range(warmup):
+        try:
+            await call(sequence)
+        except httpx.HTTPError:
+            # A flaky warmup call must not abort the run; timed errors are still counted
+            pass
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "method": method,
+        "path": path,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+async def in_process_app(args: argparse.Namespace):
+    """Import the app against a seeded mongomock database"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("In-process mode needs mongomock-motor (pip install mongomock-motor), or pass --base-url")
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "benchmark")
+    sys.path.insert(0, str(BACKEND_DIR))
+    import seed
+    import server
+
+    server.db = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    await seed.seed_database(
+        server.db, seed=args.seed, policies=args.seed_policies, devices=args.seed_devices,
+        alerts=args.seed_alerts, batch_size=1000,
+    )
+    return server.app
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.base_url:
+        transport = None
+        base_url = args.base_url.rstrip("/")
+    else:
+        transport = httpx.ASGITransport(app=await in_process_app(args))
+        base_url = "http://benchmark"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        urls = await evaluate_urls(client, args.evaluate_urls, args.seed) if "evaluate" in args.routes else []
+        for route in args.routes:
+            results[route] = await drive(client, route, args.requests, args.concurrency, args.warmup, urls)
+            print(f"{route:>10}: {results[route]['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {results[route]['p50_ms']:.2f}ms  p95 {results[route]['p95_ms']:.2f}ms  "
+                  f"p99 {results[route]['p99_ms']:.2f}ms  errors {results[route]['errors']}", file=sys.stderr)
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "target": args.base_url or "in-process",
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "evaluate_urls": args.evaluate_urls,
+            "seed": args.seed,
+            "seed_policies": args.seed_policies,
+            "seed_devices": args.seed_devices,
+            "seed_alerts": args.seed_alerts,
+        },
+        "routes": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Routes whose p95 latency rose or throughput fell by more than `tolerance`"""
+    regressions = []
+    for route, result in current["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base:
+            continue
+        if base["p95_ms"] and result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {base['p95_ms']}ms -> {result['p95_ms']}ms")
+        if base["throughput_rps"] and result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: throughput {base['throughput_rps']} -> {result['throughput_rps']} req/s")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{route}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API load and latency benchmark")
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--routes", nargs="+", choices=sorted(ROUTES), default=list(ROUTES))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per route")
+    parser.add_argument("--evaluate-urls", type=int, default=5000,
+                        help="distinct URLs the evaluate route cycles through")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--seed-policies", type=int, default=200)
+    parser.add_argument("--seed-devices", type=int, default=2000)
+    parser.add_argument("--seed-alerts", type=int, default=2000)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change vs the baseline")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
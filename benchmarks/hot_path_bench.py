@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the per-request policy evaluation hot path.
+
+Builds synthetic WebFilteringPolicy sets from 10 to 1M domains and times host
+normalization, domain suffix lookup, keyword scanning, the decision cache
+(hit and miss) and decision accounting. Half of the sample URLs hit a policy
+keyword, so both the keyword hit and miss paths are timed.
+
+Every timed pass is followed by a pass of a fixed reference loop, and each
+benchmark reports the median ns/op and the median ratio to that reference over
+--repeat passes, plus the mean transient bytes allocated per op as seen by
+tracemalloc. The ratio cancels out machine speed and most of the drift of a
+noisy host, so a benchmark only fails when its median ratio, i.e. most of its
+passes, is slower than hot_path_baseline.json by more than --tolerance, or when
+it allocates more than --alloc-tolerance above the baseline (checked only on
+the Python version the baseline was recorded with).
+
+    python benchmarks/hot_path_bench.py
+    python benchmarks/hot_path_bench.py --sizes 10 1000 --update-baseline
+"""
+
+import argparse
+import gc
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+from accounting import DecisionAccountant  # noqa: E402
+from policy_engine import CompiledPolicySet, normalize_host, split_url  # noqa: E402
+
+
+BASELINE = Path(__file__).with_name("hot_path_baseline.json")
+SIZES = [10, 1000, 100000, 1000000]
+SAMPLES = 20000
+ALLOC_SAMPLES = 500
+# Short passes are dominated by timer and scheduler noise, so fast ops loop over their inputs
+MIN_PASS_NS = 20_000_000
+# Allocation noise floor per op, e.g. one small int or a resized frame
+ALLOC_SLACK_BYTES = 32
+ACTIONS = ["block", "block", "warn", "allow"]
+CATEGORIES = ["social_media", "streaming", "gaming", "malware", "education", "custom"]
+
+
+def synthetic_policies(domains: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Policies of up to 100 domains each, with roughly sqrt(domains) keywords overall"""
+    rng = random.Random(seed)
+    keywords = max(4, min(500, int(domains ** 0.5)))
+    per_policy = min(100, domains)
+    count_policies = -(-domains // per_policy)
+    keywords_per_policy = max(1, keywords // count_policies)
+    policies = []
+    for number in range(count_policies):
+        count = min(per_policy, domains - number * per_policy)
+        policies.append({
+            "id": f"policy-{number}",
+            "name": f"Synthetic Policy {number}",
+            "category": rng.choice(CATEGORIES),
+            "action": rng.choice(ACTIONS),
+            "priority": rng.randint(1, 10),
+            "enabled": True,
+            "domains": [f"site{number}-{i}.{rng.choice(['com', 'net', 'org', 'edu'])}" for i in range(count)],
+            "keywords": [f"kw{rng.randrange(keywords)}word" for _ in range(keywords_per_policy)],
+        })
+    return policies
+
+
+def sample_urls(policies: List[Dict[str, Any]], count: int, seed: int = 2) -> List[str]:
+    """Listed subdomains and unlisted hosts, half of each with a policy keyword in the path"""
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        policy = rng.choice(policies)
+        query = rng.choice(policy["keywords"]) if i % 4 >= 2 else "lecture"
+        if i % 2:
+            domain = rng.choice(policy["domains"])
+            urls.append(f"https://www.{domain}/path/{i % 97}?q={query}")
+        else:
+            urls.append(f"http://User@Unlisted{i % 5000}.example.net:8080/index.html?q={query}")
+    return urls
+
+
+def time_pass(function: Callable[[Any], Any], inputs: Sequence[Any], rounds: int = 1) -> float:
+    """Nanoseconds per call for `rounds` passes of function over inputs, with gc paused"""
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter_ns()
+        for _ in range(rounds):
+            for value in inputs:
+                function(value)
+        return (time.perf_counter_ns() - started) / (len(inputs) * rounds)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def reference_workload() -> Tuple[Callable[[str], Any], List[str]]:
+    """A fixed dict and string workload that every timed pass is compared with.
+
+    It looks up URL-sized keys in a table as large as the decision cache, so it
+    feels the same memory effects as the cached hot path.
+    """
+    table = {f"https://host{i}.example.com/path": i for i in range(SAMPLES)}
+    keys = [f"https://host{i * 7919 % (SAMPLES * 3 // 2)}.example.com/path" for i in range(SAMPLES)]
+
+    def reference(key: str):
+        return table.get(key) or table.get(key.partition(".")[2])
+
+    return reference, keys
+
+
+def time_op(function: Callable[[Any], Any], inputs: Sequence[Any], repeat: int,
+            reference: Tuple[Callable[[Any], Any], Sequence[Any]],
+            before_pass: Optional[Callable[[], Any]] = None) -> Tuple[float, float, float]:
+    """Median ns/op, median ratio to the reference pass timed right after each pass, and reference ns/op"""
+    timings, ratios, references = [], [], []
+    reference_function, reference_inputs = reference
+    reference_rounds = -(-MIN_PASS_NS // int(time_pass(reference_function, reference_inputs) * len(reference_inputs)))
+    rounds = 1
+    if before_pass is None:
+        rounds = -(-MIN_PASS_NS // int(time_pass(function, inputs) * len(inputs) or 1))
+    for _ in range(repeat):
+        if before_pass:
+            before_pass()
+        ns = time_pass(function, inputs, rounds)
+        reference_ns = time_pass(reference_function, reference_inputs, reference_rounds)
+        timings.append(ns)
+        references.append(reference_ns)
+        ratios.append(ns / reference_ns)
+    return statistics.median(timings), statistics.median(ratios), statistics.median(references)
+
+
+def alloc_per_op(function: Callable[[Any], Any], inputs: Sequence[Any]) -> float:
+    """Mean transient bytes allocated by a single call, per tracemalloc"""
+    tracemalloc.start()
+    total = 0
+    try:
+        for value in inputs[:ALLOC_SAMPLES]:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function(value)
+            total += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return total / min(len(inputs), ALLOC_SAMPLES)
+
+
+def bench_size(domains: int, repeat: int, reference) -> Tuple[Dict[str, Dict[str, float]], List[float]]:
+    policies = synthetic_policies(domains)
+    compiled = CompiledPolicySet(policies, cache_size=SAMPLES)
+    urls = sample_urls(policies, SAMPLES)
+    hosts = [normalize_host(url) for url in urls]
+    texts = [split_url(url)[1] for url in urls]
+    decisions = [(compiled.evaluate(url), host) for url, host in zip(urls, hosts)]
+    # Miss inputs are unique, so every call evaluates and stores a new entry
+    miss_urls = [f"{url}#{i}" for i, url in enumerate(urls)]
+
+    accountant = DecisionAccountant(max_pending=len(decisions) + 1)
+
+    def account(item):
+        return accountant.record(item[0], item[1], "10.0.3.7", day="2026-01-01")
+
+    benchmarks = {
+        "normalize_host": (normalize_host, urls, None),
+        "domain_suffix_lookup": (compiled.match_host, hosts, None),
+        "keyword_scan": (compiled.matcher.find, texts, None),
+        "evaluate_uncached": (compiled.evaluate, urls, None),
+        "cache_hit": (compiled.evaluate_cached, urls, lambda: [compiled.evaluate_cached(url) for url in urls]),
+        "cache_miss": (compiled.evaluate_cached, miss_urls, None),
+        "decision_accounting": (account, decisions, None),
+    }
+    results = {}
+    reference_timings = []
+    for name, (function, inputs, prepare) in benchmarks.items():
+        if prepare:
+            prepare()
+        # Every cache_miss pass must see cold keys
+        before_pass = compiled.evaluate_cached.cache_clear if name == "cache_miss" else None
+        ns, relative, reference_ns = time_op(function, inputs, repeat, reference, before_pass)
+        reference_timings.append(reference_ns)
+        if before_pass:
+            before_pass()
+        results[name] = {
+            "ns_per_op": round(ns, 1),
+            "relative": round(relative, 3),
+            "alloc_bytes_per_op": round(alloc_per_op(function, inputs), 1),
+        }
+    return results, reference_timings
+
+
+def check(results: Dict[str, Dict[str, Dict[str, float]]], baseline: Dict[str, Any],
+          tolerance: float, alloc_tolerance: float) -> List[str]:
+    """Benchmarks slower or allocating more than the baseline by more than the tolerances"""
+    same_python = baseline.get("python", "").split(".")[:2] == sys.version.split()[0].split(".")[:2]
+    failures = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            if result["relative"] > base["relative"] * (1 + tolerance):
+                failures.append(f"{name} @ {size} domains: {result['relative']:.2f}x the reference loop "
+                                f"({result['ns_per_op']} ns/op), baseline {base['relative']:.2f}x")
+            allowed = base["alloc_bytes_per_op"] * (1 + alloc_tolerance) + ALLOC_SLACK_BYTES
+            if same_python and result["alloc_bytes_per_op"] > allowed:
+                failures.append(f"{name} @ {size} domains: {result['alloc_bytes_per_op']} B/op allocated, "
+                                f"baseline {base['alloc_bytes_per_op']} B/op")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Policy evaluation hot path micro-benchmarks")
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="domains per synthetic policy set")
+    parser.add_argument("--repeat", type=int, default=7, help="timed passes per benchmark, the median is kept")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="allowed relative slowdown of the median vs the baseline")
+    parser.add_argument("--alloc-tolerance", type=float, default=0.1,
+                        help="allowed relative growth of bytes allocated per op")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the new baseline")
+    args = parser.parse_args()
+
+    reference = reference_workload()
+    results = {}
+    reference_timings = []
+    for size in args.sizes:
+        results[str(size)], timings = bench_size(size, args.repeat, reference)
+        reference_timings += timings
+        for name, result in results[str(size)].items():
+            print(f"{size:>8} domains  {name:<22} {result['ns_per_op']:>10.1f} ns/op "
+                  f"{result['relative']:>8.2f}x ref {result['alloc_bytes_per_op']:>8.1f} B/op", file=sys.stderr)
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        report = {
+            "python": sys.version.split()[0],
+            "reference_ns": round(statistics.median(reference_timings), 1),
+            "results": results,
+        }
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+        return
+
+    if not baseline_path.exists():
+        print(json.dumps(results, indent=2))
+        return
+    failures = check(results, json.loads(baseline_path.read_text()), args.tolerance, args.alloc_tolerance)
+    for failure in failures:
+        print(f"HOT PATH REGRESSION {failure}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
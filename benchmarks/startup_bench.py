@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Worker boot benchmark for the Campus Web Access Security System API.
+
+Profiles `import server` with `python -X importtime` and reports the modules
+with the largest cumulative import cost, then starts uvicorn workers from a
+cold process and measures the time until the first successful response, then
+the latency of the first request to a Mongo backed route, which pays for the
+lazy driver import and connection.
+
+    python benchmarks/startup_bench.py --runs 5 --budget 1.0
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import httpx
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / "backend"
+
+
+def backend_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env.setdefault("DB_NAME", "benchmark")
+    return env
+
+
+def import_profile(top: int) -> Dict[str, Any]:
+    """Parse `-X importtime` output for `import server` into totals and the costliest modules"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=backend_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({"module": name.strip(), "depth": depth,
+                        "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    server = next((module for module in modules if module["module"] == "server"), None)
+    # Direct imports of server show which top-level dependencies the boot pays for
+    direct = [module for module in modules if module["depth"] == 1]
+    return {
+        "server_import_ms": server["cumulative_ms"] if server else None,
+        "server_self_ms": server["self_ms"] if server else None,
+        "direct_imports": sorted(direct, key=lambda m: m["cumulative_ms"], reverse=True)[:top],
+        "slowest_self": sorted(modules, key=lambda m: m["self_ms"], reverse=True)[:top],
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def time_to_first_request(path: str, db_path: str, timeout: float) -> Tuple[float, float]:
+    """Seconds from spawning a uvicorn worker to its first 2xx response on `path`,
+    and the duration of the first request to `db_path` after that"""
+    port = free_port()
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=backend_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        with httpx.Client(timeout=1.0) as client:
+            while time.perf_counter() - started < timeout:
+                if worker.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited: {worker.stderr.read().decode()[-2000:]}")
+                try:
+                    if client.get(f"http://127.0.0.1:{port}{path}").is_success:
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+            else:
+                raise RuntimeError(f"No successful response from {path} within {timeout}s")
+            ready = time.perf_counter() - started
+            requested = time.perf_counter()
+            client.get(f"http://127.0.0.1:{port}{db_path}", timeout=timeout).raise_for_status()
+            return ready, time.perf_counter() - requested
+    finally:
+        worker.terminate()
+        try:
+            worker.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            worker.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker import time and time-to-first-request benchmark")
+    parser.add_argument("--runs", type=int, default=3, help="cold worker starts to time")
+    parser.add_argument("--path", default="/api/health", help="route polled for the first response")
+    parser.add_argument("--db-path", default="/api/policies", help="Mongo backed route timed after the first response")
+    parser.add_argument("--top", type=int, default=10, help="modules listed in the import profile")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--budget", type=float, help="exit 1 if the median time to first request exceeds this")
+    args = parser.parse_args()
+
+    profile = import_profile(args.top)
+    print(f"import server: {profile['server_import_ms']:.1f}ms "
+          f"(module body {profile['server_self_ms']:.1f}ms)", file=sys.stderr)
+    for module in profile["direct_imports"]:
+        print(f"  {module['module']:<32} {module['cumulative_ms']:>8.1f}ms", file=sys.stderr)
+
+    runs = [time_to_first_request(args.path, args.db_path, args.timeout) for _ in range(args.runs)]
+    samples: List[float] = [ready for ready, _ in runs]
+    db_samples: List[float] = [db for _, db in runs]
+    median = statistics.median(samples)
+    db_median = statistics.median(db_samples)
+    print(f"time to first request: median {median * 1000:.0f}ms, "
+          f"min {min(samples) * 1000:.0f}ms over {args.runs} runs", file=sys.stderr)
+    print(f"first {args.db_path} request: median {db_median * 1000:.0f}ms, "
+          f"min {min(db_samples) * 1000:.0f}ms", file=sys.stderr)
+
+    print(json.dumps({
+        "python": sys.version.split()[0],
+        "import": profile,
+        "time_to_first_request_ms": {
+            "median": round(median * 1000, 1),
+            "min": round(min(samples) * 1000, 1),
+            "samples": [round(sample * 1000, 1) for sample in samples],
+        },
+        "first_db_request_ms": {
+            "path": args.db_path,
+            "median": round(db_median * 1000, 1),
+            "min": round(min(db_samples) * 1000, 1),
+            "samples": [round(sample * 1000, 1) for sample in db_samples],
+        },
+    }, indent=2))
+    if args.budget is not None and median > args.budget:
+        print(f"BOOT REGRESSION median {median:.3f}s exceeds budget {args.budget}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+from server import AlertResolveRequest
+
+
+def alerts(count, severity="high", resolved=False):
+    return [
+        {"id": f"{severity}-{resolved}-{i}", "severity": severity, "source_ip": "10.0.0.5",
+         "resolved": resolved, "created_at": datetime(2026, 1, 1, 0, i)}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = AsyncMongoMockClient()["alert_resolve_tests"]
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+class RecordedOperations:
+    """alert_operations recording the modified_count increment of each update"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.increments = []
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_one(self, query, update, *args, **kwargs):
+        self.increments.append(update.get("$inc", {}).get("modified_count"))
+        return await self.collection.update_one(query, update, *args, **kwargs)
+
+
+class StalledAlerts:
+    """security_alerts whose update_many blocks until cancelled, or raises `error`"""
+
+    def __init__(self, collection, error=None):
+        self.collection = collection
+        self.error = error
+        self.entered = asyncio.Event()
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def update_many(self, *args, **kwargs):
+        self.entered.set()
+        if self.error:
+            raise self.error
+        await asyncio.sleep(3600)
+
+
+def test_bulk_resolve_needs_ids_or_a_filter(db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.resolve_alerts(AlertResolveRequest(), Response()))
+    assert error.value.status_code == 400
+
+
+def test_small_bulk_resolve_updates_in_place(db):
+    async def run():
+        await db.security_alerts.insert_many(alerts(3) + alerts(2, "low") + alerts(1, resolved=True))
+        response = Response()
+        result = await server.resolve_alerts(AlertResolveRequest(severity="high"), response)
+        remaining = await db.security_alerts.count_documents({"resolved": False})
+        return result, response, remaining
+
+    result, response, remaining = asyncio.run(run())
+    assert response.status_code == 200
+    assert result.status == "completed" and result.operation_id is None
+    assert result.total == result.modified_count == 3
+    assert remaining == 2
+
+
+def test_large_bulk_resolve_runs_in_chunks_in_the_background(db, monkeypatch):
+    monkeypatch.setattr(server, "BULK_RESOLVE_SYNC_LIMIT", 2)
+    monkeypatch.setattr(server, "BULK_RESOLVE_CHUNK", 2)
+    operations = RecordedOperations(db.alert_operations)
+    monkeypatch.setattr(server, "db", SimpleNamespace(security_alerts=db.security_alerts, alert_operations=operations))
+
+    async def run():
+        await db.security_alerts.insert_many(alerts(5) + alerts(2, "low"))
+        response = Response()
+        started = await server.resolve_alerts(AlertResolveRequest(severity="high"), response)
+        await asyncio.gather(*server._resolve_tasks)
+        finished = await server.get_alert_resolve_operation(started.operation_id)
+        remaining = await db.security_alerts.count_documents({"resolved": False})
+        return started, response, finished, remaining
+
+    started, response, finished, remaining = asyncio.run(run())
+    assert response.status_code == 202
+    assert started.status == "running" and started.total == 5 and started.modified_count == 0
+    assert finished.status == "completed" and finished.error is None and finished.finished_at
+    assert finished.modified_count == 5
+    # Two full chunks, the last partial one, then the empty read ends the loop
+    assert operations.increments == [2, 2, 1, None]
+    assert remaining == 2
+
+
+def test_unknown_resolve_operation_is_404(db):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.get_alert_resolve_operation("missing"))
+    assert error.value.status_code == 404
+
+
+def run_stalled(db, monkeypatch, error=None):
+    """Run _resolve_in_chunks against a stalled update_many, cancelling it unless it raises"""
+    stalled = StalledAlerts(db.security_alerts, error)
+    monkeypatch.setattr(server, "db", SimpleNamespace(security_alerts=stalled, alert_operations=db.alert_operations))
+
+    async def run():
+        await db.security_alerts.insert_many(alerts(3))
+        await db.alert_operations.insert_one({"operation_id": "op", "status": "running", "total": 3,
+                                              "modified_count": 0})
+        task = asyncio.create_task(server._resolve_in_chunks("op", {"resolved": False}, datetime.utcnow()))
+        await stalled.entered.wait()
+        if error is None:
+            task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await server.get_alert_resolve_operation("op")
+
+    return asyncio.run(run())
+
+
+def test_cancelled_bulk_resolve_is_marked_interrupted(db, monkeypatch):
+    operation = run_stalled(db, monkeypatch)
+    assert operation.status == "interrupted" and "shut down" in operation.error
+    assert operation.finished_at and operation.modified_count == 0
+
+
+def test_failing_bulk_resolve_is_marked_failed(db, monkeypatch):
+    operation = run_stalled(db, monkeypatch, RuntimeError("connection reset"))
+    assert operation.status == "failed" and operation.error == "connection reset"
+    assert operation.finished_at
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from alert_search import TEXT_INDEX, search_filter, search_pipeline, search_result, split_search_text
+
+
+def test_host_terms_leave_the_text_search():
+    assert split_search_text("facebook.com") == (None, ["facebook.com"])
+    assert split_search_text("blocked https://WWW.YouTube.com/watch?v=1") == ("blocked", ["www.youtube.com"])
+    assert split_search_text("malware download") == ("malware download", [])
+    assert split_search_text('"policy.v2"') == ('"policy.v2"', [])
+    assert split_search_text(None) == (None, [])
+
+
+def test_host_terms_filter_on_destination():
+    assert search_filter({}, hosts=["facebook.com"]) == {"destination": "facebook.com"}
+    assert search_filter({}, hosts=["a.com", "b.com"]) == {"destination": {"$in": ["a.com", "b.com"]}}
+    assert search_filter({"destination": "a.com"}, resolved=False, hosts=["b.com"]) == {
+        "destination": "a.com", "resolved": False, "$and": [{"destination": "b.com"}],
+    }
+
+
+def test_text_matches_are_ranked_before_the_scan_limit():
+    pipeline = search_pipeline({}, "malware", skip=0, limit=10, scan_limit=100, facet_size=5)
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ["$match", "$addFields", "$sort", "$limit", "$facet"]
+    assert pipeline[2]["$sort"] == {"_score": -1, "created_at": -1}
+
+
+def test_filter_search_pages_and_facets():
+    from mongomock_motor import AsyncMongoMockClient
+
+    async def run():
+        alerts = AsyncMongoMockClient()["alert_search_tests"].security_alerts
+        await alerts.insert_many([
+            {"id": str(i), "severity": "high" if i % 3 == 0 else "low", "destination": f"site{i % 2}.com",
+             "policy_triggered": "p", "device_id": None, "created_at": datetime(2026, 1, 1, 0, i)}
+            for i in range(12)
+        ])
+        text, hosts = split_search_text("site1.com")
+        query = search_filter({}, hosts=hosts)
+        pipeline = search_pipeline(query, text, skip=0, limit=2, scan_limit=100, facet_size=5)
+        documents = await alerts.aggregate(pipeline).to_list(1)
+        return search_result(documents[0], 100)
+
+    result = asyncio.run(run())
+    assert result["total"] == 6 and result["total_exact"] and result["facets_exact"]
+    assert [hit["id"] for hit in result["hits"]] == ["11", "9"]
+    assert result["facets"]["severity"] == [{"value": "low", "count": 4}, {"value": "high", "count": 2}]
+
+
+def test_capped_search_marks_total_and_facets_partial():
+    document = {"total": [{"count": 100}], "hits": [], "severity": [{"_id": "high", "count": 100}]}
+    result = search_result(document, 100)
+    assert not result["total_exact"] and not result["facets_exact"]
+    assert result["facets"]["severity"] == [{"value": "high", "count": 100}]
+
+
+def test_text_search_builds_missing_indexes_without_the_scheduler(monkeypatch):
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    monkeypatch.setattr(server, "db", AsyncMongoMockClient()["alert_search_server_tests"])
+    monkeypatch.setattr(server, "_search_indexes_ready", False)
+
+    async def run():
+        await server.require_search_indexes()
+        return await server.db.security_alerts.index_information()
+
+    assert TEXT_INDEX in asyncio.run(run())
+    assert server._search_indexes_ready
+
+
+def test_text_search_answers_503_while_the_index_build_runs(monkeypatch):
+    from fastapi import HTTPException
+    import server
+
+    builds = []
+
+    async def slow_build(db):
+        builds.append(db)
+        await asyncio.sleep(0.2)
+
+    monkeypatch.setattr(server, "ensure_search_indexes", slow_build)
+    monkeypatch.setattr(server, "_search_indexes_ready", False)
+    monkeypatch.setattr(server, "ALERT_SEARCH_INDEX_WAIT", 0.05)
+
+    async def run():
+        with pytest.raises(HTTPException) as error:
+            await server.search_security_alerts(q="malware")
+        # The build keeps going after the request gave up on it
+        await asyncio.sleep(0.3)
+        await server.require_search_indexes()
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503 and error.headers["Retry-After"]
+    assert len(builds) == 1 and server._search_indexes_ready
@@ -0,0 +1,110 @@
+from datetime import datetime
+
+from detector import BurstDetector, CountMinSketch, WindowedCountMin
+from ingest import _init_worker, process_chunk
+
+
+def squid_line(timestamp, client="10.0.0.5", url="http://example.com/"):
+    return f"{timestamp:.3f} 12 {client} TCP_MISS/200 512 GET {url} - HIER_DIRECT/1.2.3.4 text/html\n"
+
+
+def test_count_min_never_undercounts():
+    sketch = CountMinSketch(width=64, depth=4)
+    truth = {f"10.0.{i // 256}.{i % 256}": i % 7 + 1 for i in range(500)}
+    for key, count in truth.items():
+        sketch.add(sketch.indexes(key), count)
+    assert all(sketch.estimate(sketch.indexes(key)) >= count for key, count in truth.items())
+
+
+def test_window_expires_old_buckets():
+    window = WindowedCountMin(window=60, buckets=6, width=256, depth=4)
+    indexes = window.indexes("10.0.0.1")
+    window.advance(1000.0)
+    window.add(indexes, 5)
+    window.advance(1030.0)
+    window.add(indexes, 3)
+    assert window.estimate(indexes) == 8
+    window.advance(1060.0)
+    assert window.estimate(indexes) == 3
+    window.advance(1090.0)
+    assert window.estimate(indexes) == 0
+
+
+def test_window_gap_longer_than_window_clears_everything():
+    window = WindowedCountMin(window=60, buckets=6, width=256, depth=4)
+    indexes = window.indexes("10.0.0.1")
+    window.advance(0.0)
+    window.add(indexes, 50)
+    window.advance(3600.0)
+    assert window.estimate(indexes) == 0
+
+
+def test_request_burst_alert_uses_observation_time():
+    detector = BurstDetector(request_threshold=100, cooldown=300)
+    alerts = []
+    for second in range(100):
+        alerts += detector.observe("10.0.0.9", now=1_700_000_000 + second * 0.5)
+    assert [alert["title"] for alert in alerts] == ["Request Rate Threshold Exceeded"]
+    assert alerts[0]["created_at"] == datetime.utcfromtimestamp(1_700_000_000 + 99 * 0.5)
+
+
+def test_block_rate_alert_needs_ratio():
+    detector = BurstDetector(block_threshold=10, block_ratio=0.5)
+    assert detector.observe_many([(100.0, "10.0.0.2", 100, 10)]) == []
+    alerts = detector.observe_many([(101.0, "10.0.0.3", 20, 15)])
+    assert [alert["severity"] for alert in alerts] == ["high"]
+
+
+def test_slow_client_spread_over_hours_is_not_a_burst():
+    # One request every 10s for three hours, all landing in a single chunk
+    _init_worker([])
+    data = "".join(squid_line(1_700_000_000 + i * 10) for i in range(1080)).encode()
+    detector = BurstDetector(request_threshold=600)
+    lines, parsed, counts, alerts, talkers, latest = process_chunk(data, "squid", detector.bucket_seconds)
+    assert parsed == 1080
+    assert [talker[0] for talker in talkers] == sorted(talker[0] for talker in talkers)
+    assert detector.observe_many(talkers) == []
+    assert detector.top_talkers(now=latest)[0]["requests"] <= 7
+
+
+def test_dense_burst_inside_a_chunk_still_alerts():
+    _init_worker([])
+    data = "".join(squid_line(1_700_000_000 + i * 0.05) for i in range(700)).encode()
+    detector = BurstDetector(request_threshold=600)
+    *_, talkers, latest = process_chunk(data, "squid", detector.bucket_seconds)
+    alerts = detector.observe_many(talkers)
+    assert len(alerts) == 1
+    assert alerts[0]["source_ip"] == "10.0.0.5"
+
+
+def test_wall_clock_call_does_not_stop_log_time_expiry():
+    # 5 requests per 10s bucket is 30 a minute, far below the threshold
+    detector = BurstDetector(request_threshold=600)
+    start = 1_600_000_000
+    alerts = []
+    for bucket in range(120):
+        alerts += detector.observe_many([(start + bucket * 10, "10.0.0.8", 5, 0)])
+        if bucket == 10:
+            detector.top_talkers()
+    assert alerts == []
+    assert detector.top_talkers(now=start + 1190)[0]["requests"] <= 30
+
+
+def test_small_backwards_steps_count_in_the_current_bucket():
+    window = WindowedCountMin(window=60, buckets=6, width=256, depth=4)
+    indexes = window.indexes("10.0.0.1")
+    window.advance(1000.0)
+    window.add(indexes, 2)
+    assert window.advance(995.0) is False
+    window.add(indexes, 3)
+    assert window.estimate(indexes) == 5
+
+
+def test_undated_records_count_at_the_chunk_log_time():
+    _init_worker([])
+    dated = "eventtime=1700000031 srcip=10.0.0.5 hostname=example.com\n"
+    undated = "srcip=10.0.0.5 hostname=example.com\n"
+    *_, talkers, latest = process_chunk((undated + dated + undated).encode(), "fortigate", 10.0)
+    assert talkers == [(1_700_000_030, "10.0.0.5", 3, 0)]
+    *_, talkers, latest = process_chunk((undated * 3).encode(), "fortigate", 10.0)
+    assert talkers == [(None, "10.0.0.5", 3, 0)] and latest is None
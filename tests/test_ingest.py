@@ -0,0 +1,155 @@
+import asyncio
+import io
+import os
+from datetime import datetime
+
+from ingest import PolicyAlertCooldown, _init_worker, ingest, load_offset, process_chunk, read_chunk, save_offset
+
+
+def squid_line(timestamp, url, client="10.0.0.5"):
+    return f"{timestamp:.3f} 12 {client} TCP_MISS/200 512 GET {url} - HIER_DIRECT/1.2.3.4 text/html\n"
+
+
+def block_policy(id, keywords=(), domains=()):
+    return {"id": id, "name": id, "category": "malware", "action": "block", "priority": 1,
+            "domains": list(domains), "keywords": list(keywords), "enabled": True,
+            "updated_at": datetime.utcnow()}
+
+
+def mongo():
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["ingest_tests"]
+
+
+def test_read_chunk_extends_to_the_next_newline():
+    handle = io.BytesIO(b"aaaa\nbbbbbb\ncc\n")
+    assert read_chunk(handle, 7, partial=False) == b"aaaa\nbbbbbb\n"
+    assert read_chunk(handle, 7, partial=False) == b"cc\n"
+    assert read_chunk(handle, 7, partial=False) == b""
+
+
+def test_read_chunk_leaves_an_unfinished_line_for_later():
+    handle = io.BytesIO(b"aaaa\nbbbb")
+    assert read_chunk(handle, 3, partial=False) == b"aaaa\n"
+    assert read_chunk(handle, 3, partial=False) == b""
+    assert handle.tell() == 5
+    # Once the writer finishes the line it is read in full
+    handle.seek(0, os.SEEK_END)
+    handle.write(b"bb\n")
+    handle.seek(5)
+    assert read_chunk(handle, 3, partial=False) == b"bbbbbb\n"
+
+
+def test_read_chunk_returns_the_final_partial_line_when_asked():
+    handle = io.BytesIO(b"aaaa\nbbbb")
+    assert read_chunk(handle, 100, partial=True) == b"aaaa\nbbbb"
+    handle.seek(0)
+    assert read_chunk(handle, 100, partial=False) == b"aaaa\n"
+
+
+def test_offsets_reset_on_rotation_and_truncation():
+    async def run():
+        db = mongo()
+        await save_offset(db, "/var/log/a.log", inode=11, offset=500)
+        return [
+            await load_offset(db, "/var/log/a.log", 11, 800),
+            await load_offset(db, "/var/log/a.log", 12, 800),
+            await load_offset(db, "/var/log/a.log", 11, 100),
+            await load_offset(db, "/var/log/b.log", 11, 800),
+        ]
+
+    assert asyncio.run(run()) == [500, 0, 0, 0]
+
+
+def test_alerts_are_dated_by_log_time():
+    _init_worker([block_policy("bad", keywords=["evil"])])
+    data = (squid_line(1_700_000_000, "http://evil.example.com/") +
+            squid_line(1_700_000_030, "http://evil.example.com/x")).encode()
+    lines, parsed, counts, alerts, talkers, latest = process_chunk(data, "squid")
+    assert (lines, parsed, latest) == (2, 2, 1_700_000_030)
+    assert [alert["created_at"] for alert in alerts] == [datetime.utcfromtimestamp(1_700_000_030)]
+
+
+def test_policy_alert_cooldown_is_per_client_host_and_policy():
+    def alert(at, source_ip="10.0.0.5"):
+        return {"source_ip": source_ip, "destination": "evil.example.com", "policy_triggered": "bad",
+                "title": "Blocked Malware Access", "created_at": datetime.utcfromtimestamp(at)}
+
+    cooldown = PolicyAlertCooldown(300)
+    kept = cooldown.filter([alert(1000), alert(1100), alert(1100, "10.0.0.6"), alert(1299)])
+    # Log time going backwards, e.g. a replayed file, starts a new cooldown
+    kept += cooldown.filter([alert(1300), alert(1350), alert(200)])
+    assert [(a["source_ip"], a["created_at"]) for a in kept] == [
+        ("10.0.0.5", datetime.utcfromtimestamp(1000)), ("10.0.0.6", datetime.utcfromtimestamp(1100)),
+        ("10.0.0.5", datetime.utcfromtimestamp(1300)), ("10.0.0.5", datetime.utcfromtimestamp(200)),
+    ]
+
+
+def test_repeated_policy_hits_across_chunks_alert_once(tmp_path):
+    log = tmp_path / "access.log"
+    log.write_text("".join(squid_line(1_700_000_000 + i, f"http://evil.example.com/{i}") for i in range(40)) +
+                   squid_line(1_700_000_400, "http://evil.example.com/later"))
+
+    async def run():
+        db = mongo()
+        await db.web_filtering_policies.insert_one(block_policy("bad", keywords=["evil"]))
+        await ingest(db, str(log), "squid", workers=1, chunk_bytes=1024)
+        return await db.security_alerts.find({"policy_triggered": "bad"}, {"_id": 0}).to_list(None)
+
+    alerts = asyncio.run(run())
+    # The first chunk alerts at its last line, the next chunks are inside the cooldown
+    first_chunk = 1024 // len(squid_line(1_700_000_000, "http://evil.example.com/0"))
+    assert [alert["created_at"] for alert in alerts] == [
+        datetime.utcfromtimestamp(1_700_000_000 + first_chunk), datetime.utcfromtimestamp(1_700_000_400),
+    ]
+
+
+def test_ingest_resumes_from_the_saved_offset(tmp_path):
+    log = tmp_path / "access.log"
+    log.write_text("".join(squid_line(1_700_000_000 + i, f"http://site{i}.example.com/") for i in range(50)))
+
+    async def run():
+        db = mongo()
+        first = await ingest(db, str(log), "squid", workers=1, chunk_bytes=1024)
+        with open(log, "a") as handle:
+            handle.write("".join(squid_line(1_700_000_100 + i, "http://late.example.com/") for i in range(5)))
+        second = await ingest(db, str(log), "squid", workers=1, chunk_bytes=1024)
+        state = await db.ingest_offsets.find_one({"path": str(log.resolve())})
+        return first, second, state
+
+    first, second, state = asyncio.run(run())
+    assert first["lines"] == 50
+    assert second["lines"] == 5
+    assert state["offset"] == log.stat().st_size
+
+
+def test_following_ingest_picks_up_policy_changes(tmp_path):
+    log = tmp_path / "access.log"
+    log.write_text(squid_line(1_700_000_000, "http://evil.example.com/"))
+
+    async def run():
+        db = mongo()
+        task = asyncio.create_task(ingest(db, str(log), "squid", workers=1, chunk_bytes=1024,
+                                          follow=True, poll_interval=0.05, policy_interval=0))
+
+        async def wait_for_offset(size):
+            for _ in range(200):
+                state = await db.ingest_offsets.find_one({})
+                if state and state["offset"] == size:
+                    return
+                await asyncio.sleep(0.05)
+            raise AssertionError("ingest did not catch up")
+
+        await wait_for_offset(log.stat().st_size)
+        await db.web_filtering_policies.insert_one(block_policy("bad", keywords=["evil"]))
+        await asyncio.sleep(0.3)
+        with open(log, "a") as handle:
+            handle.write(squid_line(1_700_000_010, "http://evil.example.com/again"))
+        await wait_for_offset(log.stat().st_size)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return await db.security_alerts.find({}, {"_id": 0}).to_list(None)
+
+    alerts = asyncio.run(run())
+    assert [alert["destination"] for alert in alerts] == ["evil.example.com"]
+    assert alerts[0]["created_at"] == datetime.utcfromtimestamp(1_700_000_010)
@@ -0,0 +1,48 @@
+from log_parsers import PARSERS, LogRecord, parse_cef, parse_fortigate, parse_squid
+
+
+def test_squid_native_line():
+    line = ("1700000000.123    431 10.1.2.3 TCP_MISS/200 1024 GET "
+            "http://WWW.Example.com:8080/watch?v=1 - HIER_DIRECT/93.184.216.34 text/html")
+    assert parse_squid(line) == LogRecord(
+        1700000000.123, "10.1.2.3", "http://WWW.Example.com:8080/watch?v=1", "www.example.com",
+    )
+
+
+def test_squid_connect_and_malformed_lines():
+    record = parse_squid("1700000000.5 12 10.0.0.7 TCP_TUNNEL/200 0 CONNECT mail.example.org:443 - HIER_DIRECT/1.2.3.4 -")
+    assert record.host == "mail.example.org"
+    assert parse_squid("") is None
+    assert parse_squid("# comment line") is None
+    assert parse_squid("not-a-time 12 10.0.0.7 TCP_MISS/200 0 GET http://a.com/ - -") is None
+
+
+def test_fortigate_date_time_and_eventtime():
+    line = ('date=2026-01-02 time=03:04:05 devname="FG100" type="utm" subtype="webfilter" '
+            'srcip=10.9.8.7 hostname="Social.Example.com" url="/feed?x=1" action="blocked"')
+    record = parse_fortigate(line)
+    assert record == LogRecord(1767323045.0, "10.9.8.7", "social.example.com/feed?x=1", "social.example.com")
+    nanoseconds = parse_fortigate('eventtime=1767323045123456789 srcip=10.9.8.7 hostname=a.example.com')
+    assert abs(nanoseconds.timestamp - 1767323045.123) < 1e-3
+    assert nanoseconds.url == "a.example.com/"
+    assert parse_fortigate('date=2026-01-02 time=03:04:05 srcip=10.9.8.7 action="pass"') is None
+
+
+def test_cef_with_syslog_prefix_and_escapes():
+    line = ("<134>Jan  2 03:04:05 proxy CEF:0|Vendor|Proxy|1.0|100|Web request|3|"
+            "rt=1767323045000 src=10.4.4.4 dhost=files.example.net "
+            "request=https://files.example.net/a\\=b/c cs1=with spaces here")
+    record = parse_cef(line)
+    assert record == LogRecord(1767323045.0, "10.4.4.4", "https://files.example.net/a=b/c", "files.example.net")
+
+
+def test_cef_falls_back_to_dhost_and_rejects_other_lines():
+    record = parse_cef("CEF:0|V|P|1|1|n|1|src=10.0.0.1 dhost=video.example.com")
+    assert record.host == "video.example.com" and record.timestamp == 0.0
+    assert parse_cef("CEF:0|V|P|1|1|n|1|src=10.0.0.1") is None
+    assert parse_cef("CEF:0|V|P|only|four") is None
+    assert parse_cef("plain syslog message") is None
+
+
+def test_parsers_registry():
+    assert set(PARSERS) == {"squid", "fortigate", "cef"}
@@ -0,0 +1,147 @@
+import asyncio
+import itertools
+import random
+
+from policy_engine import KEYWORD_FIND_LIMIT, CompiledPolicySet, KeywordMatcher
+
+
+def policy(id, action, priority=1, domains=(), keywords=()):
+    return {"id": id, "name": id, "category": "custom", "action": action, "priority": priority,
+            "domains": list(domains), "keywords": list(keywords), "enabled": True}
+
+
+def demo_policies():
+    from mongomock_motor import AsyncMongoMockClient
+    import server
+
+    async def load():
+        server.db = AsyncMongoMockClient()["policy_engine_tests"]
+        await server.initialize_demo_data()
+        return await server.db.web_filtering_policies.find({}, {"_id": 0}).to_list(None)
+
+    return asyncio.run(load())
+
+
+def findings(analysis, kind):
+    return [
+        (f["policy_name"], f["rule_type"], f["rule"], f["by_policy_name"], f["by_rule_type"], f["by_rule"])
+        for f in analysis["findings"] if f["type"] == kind
+    ]
+
+
+def test_evaluate_prefers_priority_then_block():
+    compiled = CompiledPolicySet([
+        policy("allow-edu", "allow", 2, domains=["edu"]),
+        policy("block-video", "block", 1, keywords=["video"]),
+        policy("warn-mit", "warn", 1, domains=["mit.edu"]),
+    ])
+    assert compiled.evaluate("https://ocw.mit.edu/video/1").policy_id == "block-video"
+    assert compiled.evaluate("https://ocw.mit.edu/notes").policy_id == "warn-mit"
+    assert compiled.evaluate("https://cs.stanford.edu/").policy_id == "allow-edu"
+    assert compiled.evaluate("https://example.com/").action == "allow"
+
+
+def test_trie_scan_finds_overlapping_keywords_like_find():
+    keywords = ["tube", "youtube", "you", "out", "u"] + [f"filler{i}" for i in range(KEYWORD_FIND_LIMIT)]
+    trie, small = KeywordMatcher(keywords), KeywordMatcher(keywords[:5])
+    text = "youtube.com/yout/filler12"
+    assert sorted(trie.finditer(text)) == sorted([*small.finditer(text), (17, "filler1"), (17, "filler12")])
+    assert trie.find(text) == small.find(text) | {"filler1", "filler12"}
+
+
+def test_demo_policies_analysis():
+    analysis = CompiledPolicySet(demo_policies()).analyze(1000)
+    assert analysis["policies_analyzed"] == 4
+    assert analysis["dead_policies"] == []
+    assert findings(analysis, "redundant") == [
+        ("Block Gaming Sites", "domain", "epic.games", "Block Gaming Sites", "keyword", "games"),
+    ]
+    assert analysis["shadowed"] == analysis["conflicts"] == analysis["overlaps"] == 0
+    # The education allow list could meet each block policy on some URL, but no rule shows it
+    assert analysis["possible_overlaps"] == 3
+    assert not analysis["truncated"]
+
+
+def test_analysis_is_cached_once_and_sliced_per_limit():
+    compiled = CompiledPolicySet([
+        policy("block-example", "block", 1, domains=["example.com"]),
+        policy("allow-www", "allow", 2, domains=["www.example.com", "mail.example.com"]),
+    ])
+    analysis = compiled.analyze(10)
+    assert compiled.analyze() is analysis and len(analysis["findings"]) == 2
+    limited = compiled.analyze(1)
+    assert limited["findings"] == analysis["findings"][:1] and limited["truncated"]
+    assert not analysis["truncated"] and limited["shadowed"] == analysis["shadowed"] == 2
+
+
+def test_shadowed_and_conflicting_rules():
+    analysis = CompiledPolicySet([
+        policy("block-example", "block", 1, domains=["example.com"]),
+        policy("allow-www", "allow", 2, domains=["www.example.com"]),
+        policy("warn-video", "warn", 3, keywords=["video"]),
+        policy("allow-videos", "allow", 3, keywords=["videos"]),
+    ]).analyze()
+    assert findings(analysis, "shadowed") == [
+        ("allow-www", "domain", "www.example.com", "block-example", "domain", "example.com"),
+    ]
+    assert findings(analysis, "conflict") == [
+        ("allow-videos", "keyword", "videos", "warn-video", "keyword", "video"),
+    ]
+    assert analysis["dead_policies"] == [
+        {"policy_id": "allow-www", "policy_name": "allow-www"},
+        {"policy_id": "allow-videos", "policy_name": "allow-videos"},
+    ]
+
+
+def test_overlap_needs_a_keyword_inside_a_better_ranked_rule():
+    analysis = CompiledPolicySet([
+        policy("allow-tube", "allow", 2, keywords=["tube", "learning"]),
+        policy("block-youtube", "block", 1, domains=["youtube.com"]),
+        policy("warn-videos", "warn", 1, keywords=["videos"]),
+        policy("allow-video", "allow", 3, keywords=["video"]),
+    ]).analyze()
+    assert findings(analysis, "overlap") == [
+        ("allow-tube", "keyword", "tube", "block-youtube", "domain", "youtube.com"),
+        ("allow-video", "keyword", "video", "warn-videos", "keyword", "videos"),
+    ]
+    assert analysis["overlaps"] == 2
+    assert analysis["possible_overlaps"] == 5
+
+
+def test_overlaps_match_pairwise_enumeration():
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "delta", "alphabet", "betamax"]
+    policies = [
+        policy(f"p{i}", rng.choice(["allow", "warn", "block"]), rng.randint(1, 3),
+               domains=rng.sample([f"{w}.com" for w in words], rng.randint(0, 2)),
+               keywords=rng.sample(words, rng.randint(0, 2)))
+        for i in range(40)
+    ]
+    compiled = CompiledPolicySet(policies)
+    analysis = compiled.analyze()
+    reported = {
+        frozenset((f["policy_id"], f["by_policy_id"]))
+        for f in analysis["findings"] if f["type"] in ("shadowed", "conflict")
+    }
+    possible = {
+        frozenset((a.id, b.id))
+        for a, b in itertools.combinations(compiled.rules, 2)
+        if a.action != b.action and (a.keywords or b.keywords)
+        and (a.domains or a.keywords) and (b.domains or b.keywords)
+    } - reported
+    assert analysis["possible_overlaps"] == len(possible)
+    # The best ranked owner of a keyword that occurs in a better ranked rule of another action
+    owner = {}
+    for rule in compiled.rules:
+        for keyword in rule.keywords:
+            owner.setdefault(keyword, rule)
+    evidence = {
+        frozenset((owner[keyword].id, better.id))
+        for i, better in enumerate(compiled.rules)
+        for keyword in owner
+        if compiled.rules.index(owner[keyword]) > i and owner[keyword].action != better.action
+        and any(keyword in value for value in better.domains + better.keywords)
+    } - reported
+    overlaps = {frozenset((f["policy_id"], f["by_policy_id"])) for f in analysis["findings"] if f["type"] == "overlap"}
+    assert overlaps == evidence and evidence
+    assert analysis["overlaps"] == len(evidence)
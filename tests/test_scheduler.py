@@ -0,0 +1,109 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from scheduler import CronSchedule, MongoLease, Scheduler
+
+
+def mongo():
+    from mongomock_motor import AsyncMongoMockClient
+    return AsyncMongoMockClient()["scheduler_tests"]
+
+
+def test_cron_next_after_is_strictly_later():
+    daily = CronSchedule("17 3 * * *")
+    assert daily.next_after(datetime(2026, 1, 1, 3, 16, 59)) == datetime(2026, 1, 1, 3, 17)
+    assert daily.next_after(datetime(2026, 1, 1, 3, 17)) == datetime(2026, 1, 2, 3, 17)
+    assert daily.next_after(datetime(2026, 12, 31, 23, 59)) == datetime(2027, 1, 1, 3, 17)
+
+
+def test_cron_steps_ranges_and_lists():
+    schedule = CronSchedule("*/15 9-17 * * 1-5")
+    # Friday evening rolls over to Monday morning
+    assert schedule.next_after(datetime(2026, 1, 2, 17, 50)) == datetime(2026, 1, 5, 9, 0)
+    assert schedule.next_after(datetime(2026, 1, 5, 9, 0)) == datetime(2026, 1, 5, 9, 15)
+    assert CronSchedule("0 0,12 * * *").next_after(datetime(2026, 1, 1, 0, 0)) == datetime(2026, 1, 1, 12, 0)
+
+
+def test_cron_day_of_month_or_day_of_week():
+    # Both restricted: either the 13th or any Friday, like cron
+    schedule = CronSchedule("0 0 13 * 5")
+    assert schedule.next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 2)
+    assert schedule.next_after(datetime(2026, 1, 12)) == datetime(2026, 1, 13)
+    assert CronSchedule("0 0 * * 7").next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 4)
+
+
+def test_cron_aliases_and_leap_day():
+    assert CronSchedule("@hourly").next_after(datetime(2026, 1, 1, 5, 30)) == datetime(2026, 1, 1, 6, 0)
+    assert CronSchedule("0 0 29 2 *").next_after(datetime(2026, 3, 1)) == datetime(2028, 2, 29)
+
+
+def test_cron_rejects_invalid_expressions():
+    for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *"):
+        with pytest.raises(ValueError):
+            CronSchedule(expression)
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2026, 1, 1))
+
+
+def test_lease_is_held_by_one_owner_until_released_or_expired():
+    async def run():
+        db = mongo()
+        first, second = MongoLease(db, owner="worker-1"), MongoLease(db, owner="worker-2")
+        results = [await first.acquire("expire", 60), await second.acquire("expire", 60)]
+        # The holder can extend its own lease
+        results.append(await first.acquire("expire", 60))
+        await first.release("expire")
+        results.append(await second.acquire("expire", 60))
+        # An expired lease can be taken over
+        expired = datetime.utcnow() - timedelta(seconds=1)
+        await db.scheduler_leases.update_one({"_id": "expire"}, {"$set": {"expires_at": expired}})
+        results.append(await first.acquire("expire", 60))
+        lease = await db.scheduler_leases.find_one({"_id": "expire"})
+        return results, lease["owner"]
+
+    results, owner = asyncio.run(run())
+    assert results == [True, False, True, True, True]
+    assert owner == "worker-1"
+
+
+def test_concurrent_lease_attempts_have_one_winner():
+    async def run():
+        db = mongo()
+        leases = [MongoLease(db, owner=f"worker-{i}") for i in range(8)]
+        return await asyncio.gather(*(lease.acquire("flush", 30) for lease in leases))
+
+    assert sorted(asyncio.run(run())) == [False] * 7 + [True]
+
+
+def test_leases_are_per_job():
+    async def run():
+        db = mongo()
+        first, second = MongoLease(db, owner="worker-1"), MongoLease(db, owner="worker-2")
+        return await first.acquire("a", 30), await second.acquire("b", 30)
+
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_run_at_start_waits_for_the_start_delay():
+    async def run():
+        runs = []
+
+        async def job():
+            runs.append(asyncio.get_running_loop().time())
+
+        jobs = Scheduler()
+        jobs.add_cron("now", job, "@daily", leased=False, run_at_start=True)
+        jobs.add_cron("later", job, "@daily", leased=False, run_at_start=True, start_delay=0.2)
+        started = asyncio.get_running_loop().time()
+        jobs.start()
+        await asyncio.sleep(0.05)
+        early = len(runs)
+        await asyncio.sleep(0.3)
+        await jobs.stop()
+        return early, [round(at - started, 1) for at in runs]
+
+    early, runs = asyncio.run(run())
+    assert early == 1
+    assert len(runs) == 2 and runs[1] >= 0.2
@@ -0,0 +1,65 @@
+import pytest
+
+from simulation import _workers, keyword_changes, simulate_counters
+
+
+def policy(id, action, priority=1, domains=(), keywords=(), enabled=True):
+    return {"id": id, "name": id, "category": "custom", "action": action, "priority": priority,
+            "domains": list(domains), "keywords": list(keywords), "enabled": enabled}
+
+
+CURRENT = [
+    policy("block-video", "block", 1, keywords=["video"]),
+    policy("allow-edu", "allow", 2, domains=["edu"]),
+]
+
+# mit.edu/video was blocked by the keyword, the rest of mit.edu allowed
+COUNTERS = [
+    ("mit.edu", "10.0.0.0/24", "block-video", "custom", 5),
+    ("mit.edu", "10.0.0.0/24", "allow-edu", "custom", 7),
+]
+
+
+def test_keyword_decisions_survive_unrelated_changes():
+    proposed = CURRENT + [policy("warn-mit", "warn", 2, domains=["mit.edu"])]
+    result = simulate_counters(COUNTERS, CURRENT, proposed, workers=1)
+    assert result["transitions"] == {"block->block": 5, "allow->warn": 7}
+    assert result["changed_requests"] == 7
+
+
+def test_outranking_domain_policy_overrides_keyword_decision():
+    proposed = CURRENT + [policy("allow-mit", "allow", 0, domains=["mit.edu"])]
+    result = simulate_counters(COUNTERS, CURRENT, proposed, workers=1)
+    assert result["transitions"] == {"block->allow": 5, "allow->allow": 7}
+
+
+def test_keyword_changes_are_rejected_for_counters():
+    proposed = [policy("block-video", "block", 1, keywords=["video", "stream"]), CURRENT[1]]
+    assert keyword_changes(CURRENT, proposed) == ["block-video"]
+    assert keyword_changes(CURRENT, [CURRENT[1]]) == ["block-video"]
+    assert keyword_changes(CURRENT, [{**CURRENT[0], "name": "renamed"}, CURRENT[1]]) == []
+    with pytest.raises(ValueError):
+        simulate_counters(COUNTERS, CURRENT, [CURRENT[1]], workers=1)
+
+
+def test_workers_are_capped_at_cpu_count(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: 4)
+    assert _workers(None) == 4
+    assert _workers(2) == 2
+    assert _workers(10000) == 4
+    assert _workers(-3) == 1
+
+
+def test_no_op_proposal_changes_nothing_even_after_earlier_edits():
+    # Recorded under a policy that has since been deleted
+    counters = COUNTERS + [("mit.edu", "10.0.1.0/24", "old-block-mit", "custom", 9)]
+    result = simulate_counters(counters, CURRENT, list(CURRENT), workers=1)
+    assert result["changed_requests"] == 0
+    assert result["transitions"] == {"block->block": 5, "allow->allow": 16}
+
+
+def test_keyword_decision_from_a_removed_policy_is_not_replayed():
+    current = [CURRENT[1]]
+    result = simulate_counters(COUNTERS, current, current + [policy("warn-mit", "warn", 1, domains=["mit.edu"])],
+                               workers=1)
+    assert result["transitions"] == {"allow->warn": 12}
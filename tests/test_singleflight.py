@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Loader:
+    """Counts calls and returns the call number once released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        call = self.calls
+        await self.release.wait()
+        return call
+
+
+def test_concurrent_callers_share_one_execution():
+    async def run():
+        flights, load = SingleFlight(), Loader()
+        load.release = asyncio.Event()
+        waiters = [asyncio.create_task(flights.do("key", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        load.release.set()
+        return await asyncio.gather(*waiters), load.calls, flights.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert results == [1] * 5 and calls == 1
+    assert stats == {"key": {"requests": 5, "executions": 1, "coalesced": 4, "in_flight": 0}}
+
+
+def test_forget_starts_a_fresh_call_for_later_callers():
+    async def run():
+        flights, load = SingleFlight(), Loader()
+        load.release = asyncio.Event()
+        before = [asyncio.create_task(flights.do("key", load)) for _ in range(2)]
+        await asyncio.sleep(0)
+        flights.forget("key")
+        after = [asyncio.create_task(flights.do("key", load)) for _ in range(2)]
+        await asyncio.sleep(0)
+        in_flight = flights.stats()["key"]["in_flight"]
+        load.release.set()
+        return await asyncio.gather(*before), await asyncio.gather(*after), in_flight, flights.stats()
+
+    before, after, in_flight, stats = asyncio.run(run())
+    assert before == [1, 1] and after == [2, 2]
+    assert in_flight == 1
+    # The forgotten call finishing does not drop the newer one from the table
+    assert stats["key"] == {"requests": 4, "executions": 2, "coalesced": 2, "in_flight": 0}
+
+
+def test_cancelled_first_caller_does_not_cancel_the_shared_call():
+    async def run():
+        flights, load = SingleFlight(), Loader()
+        load.release = asyncio.Event()
+        first = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(flights.do("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        load.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, load.calls
+
+    assert asyncio.run(run()) == (1, 1)
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await release.wait()
+            raise RuntimeError("boom")
+
+        waiters = [asyncio.create_task(flights.do("key", fail)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        # Nothing is cached: the next caller runs the function again
+        release.clear()
+        retry = asyncio.create_task(flights.do("key", fail))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(retry, return_exceptions=True)
+        return results, len(calls), flights.stats()
+
+    results, calls, stats = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert calls == 2
+    assert stats["key"] == {"requests": 4, "executions": 2, "coalesced": 2, "in_flight": 0}
+
+
+def test_stats_are_kept_per_key():
+    async def run():
+        flights = SingleFlight()
+
+        async def value():
+            return "v"
+
+        await flights.do("a", value)
+        await flights.do("a", value)
+        await flights.do("b", value)
+        return flights.stats()
+
+    assert asyncio.run(run()) == {
+        "a": {"requests": 2, "executions": 2, "coalesced": 0, "in_flight": 0},
+        "b": {"requests": 1, "executions": 1, "coalesced": 0, "in_flight": 0},
+    }